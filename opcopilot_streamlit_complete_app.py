@@ -1,14 +1,18 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-import plotly.express as px
+from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
 import json
+import orjson
 import uuid
 from dataclasses import dataclass, asdict
+from collections import defaultdict, namedtuple
+from types import MappingProxyType
 from typing import List, Dict, Optional
 import sqlite3
 import os
+import threading
 
 # Configuration de la page
 st.set_page_config(
@@ -112,7 +116,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Classes de données
-@dataclass
+@dataclass(slots=True)
 class Phase:
     id: str
     nom: str
@@ -128,7 +132,7 @@ class Phase:
         if self.freins is None:
             self.freins = []
 
-@dataclass
+@dataclass(slots=True)
 class Operation:
     id: str
     nom: str
@@ -145,7 +149,7 @@ class Operation:
         if self.phases is None:
             self.phases = []
 
-@dataclass
+@dataclass(slots=True)
 class ACO:
     nom: str
     email: str
@@ -154,71 +158,142 @@ class ACO:
     operations_en_cours: int = 0
     total_budget: float = 0.0
 
+def parse_iso_dates(valeurs: List[str]) -> List[datetime]:
+    """Convertit une colonne de dates ISO en datetime en une seule passe vectorisée"""
+    return list(pd.to_datetime(valeurs, format="ISO8601", cache=True).to_pydatetime())
+
+def build_operations(operations_data: List[tuple], phases_data: List[tuple]) -> List[Operation]:
+    """Construit les opérations et leurs phases à partir des lignes SQLite"""
+    # Conversion vectorisée des dates ISO
+    phases_debut = parse_iso_dates([phase_data[3] for phase_data in phases_data])
+    phases_fin = parse_iso_dates([phase_data[4] for phase_data in phases_data])
+    
+    phases_par_operation = {}
+    for phase_data, date_debut, date_fin in zip(phases_data, phases_debut, phases_fin):
+        phase = Phase(
+            id=phase_data[0],
+            nom=phase_data[2],
+            date_debut=date_debut,
+            date_fin=date_fin,
+            couleur=phase_data[5],
+            statut=phase_data[6],
+            description=phase_data[7] or "",
+            responsable=phase_data[8] or "",
+            # La plupart des phases n'ont aucun frein : éviter le parsing JSON
+            freins=orjson.loads(phase_data[9]) if phase_data[9] and phase_data[9] != "[]" else []
+        )
+        phases_par_operation.setdefault(phase_data[1], []).append(phase)
+    
+    ops_creation = parse_iso_dates([op_data[4] for op_data in operations_data])
+    ops_debut = parse_iso_dates([op_data[5] for op_data in operations_data])
+    ops_fin = parse_iso_dates([op_data[6] for op_data in operations_data])
+    
+    operations = []
+    for op_data, date_creation, date_debut, date_fin_prevue in zip(operations_data, ops_creation, ops_debut, ops_fin):
+        operation = Operation(
+            id=op_data[0],
+            nom=op_data[1],
+            type_operation=op_data[2],
+            aco_responsable=op_data[3],
+            date_creation=date_creation,
+            date_debut=date_debut,
+            date_fin_prevue=date_fin_prevue,
+            budget=op_data[7],
+            statut=op_data[8],
+            phases=phases_par_operation.get(op_data[0], [])
+        )
+        operations.append(operation)
+    
+    return operations
+
+def build_aco(aco_data: List[tuple], aco_stats: Dict[str, tuple]) -> List[ACO]:
+    """Construit les ACO à partir des lignes SQLite et de leurs statistiques"""
+    aco_list = []
+    for aco_record in aco_data:
+        operations_en_cours, total_budget = aco_stats.get(aco_record[0], (0, 0.0))
+        
+        aco = ACO(
+            nom=aco_record[0],
+            email=aco_record[1],
+            telephone=aco_record[2],
+            specialites=json.loads(aco_record[3]),
+            operations_en_cours=operations_en_cours,
+            total_budget=total_budget
+        )
+        aco_list.append(aco)
+    return aco_list
+
 class DatabaseManager:
     def __init__(self, db_path="opcopilot.db"):
         self.db_path = db_path
+        # Connexion persistante partagée entre les sessions (get_database est un singleton) :
+        # le cache de requêtes préparées de sqlite3 est conservé d'un appel à l'autre
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, cached_statements=256)
+        self.lock = threading.Lock()
+        # Version des données, incrémentée à chaque sauvegarde (clé des caches st.cache_data)
+        self.version = 0
         self.init_database()
     
     def init_database(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Table operations
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS operations (
-                id TEXT PRIMARY KEY,
-                nom TEXT NOT NULL,
-                type_operation TEXT NOT NULL,
-                aco_responsable TEXT NOT NULL,
-                date_creation TEXT NOT NULL,
-                date_debut TEXT NOT NULL,
-                date_fin_prevue TEXT NOT NULL,
-                budget REAL NOT NULL,
-                statut TEXT DEFAULT 'Créée'
-            )
-        """)
-        
-        # Table phases
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS phases (
-                id TEXT PRIMARY KEY,
-                operation_id TEXT NOT NULL,
-                nom TEXT NOT NULL,
-                date_debut TEXT NOT NULL,
-                date_fin TEXT NOT NULL,
-                couleur TEXT NOT NULL,
-                statut TEXT DEFAULT 'En attente',
-                description TEXT,
-                responsable TEXT,
-                freins TEXT,
-                FOREIGN KEY (operation_id) REFERENCES operations (id)
-            )
-        """)
-        
-        # Table ACO
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS aco (
-                nom TEXT PRIMARY KEY,
-                email TEXT,
-                telephone TEXT,
-                specialites TEXT
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
-        
-        # Initialiser ACO par défaut
-        self.init_default_aco()
-    
-    def init_default_aco(self):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*) FROM aco")
-        count = cursor.fetchone()[0]
-        
-        if count == 0:
+        with self.lock:
+            cursor = self.conn.cursor()
+            
+            # Pages de 8 Ko (effectif uniquement à la création de la base, avant le passage en WAL)
+            cursor.execute("PRAGMA page_size=8192")
+            # Journal WAL (lectures non bloquées par les écritures) et cache de pages de 64 Mo
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA cache_size=-64000")
+            # Lectures via mmap (256 Mo) plutôt que par appels read()
+            cursor.execute("PRAGMA mmap_size=268435456")
+            
+            # Table operations
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS operations (
+                    id TEXT PRIMARY KEY,
+                    nom TEXT NOT NULL,
+                    type_operation TEXT NOT NULL,
+                    aco_responsable TEXT NOT NULL,
+                    date_creation TEXT NOT NULL,
+                    date_debut TEXT NOT NULL,
+                    date_fin_prevue TEXT NOT NULL,
+                    budget REAL NOT NULL,
+                    statut TEXT DEFAULT 'Créée'
+                )
+            """)
+            
+            # Table phases
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS phases (
+                    id TEXT PRIMARY KEY,
+                    operation_id TEXT NOT NULL,
+                    nom TEXT NOT NULL,
+                    date_debut TEXT NOT NULL,
+                    date_fin TEXT NOT NULL,
+                    couleur TEXT NOT NULL,
+                    statut TEXT DEFAULT 'En attente',
+                    description TEXT,
+                    responsable TEXT,
+                    freins TEXT,
+                    FOREIGN KEY (operation_id) REFERENCES operations (id)
+                )
+            """)
+            
+            # Table ACO
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS aco (
+                    nom TEXT PRIMARY KEY,
+                    email TEXT,
+                    telephone TEXT,
+                    specialites TEXT
+                )
+            """)
+            
+            # Index pour les agrégats par ACO, le chargement des phases et le tri des opérations récentes
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ops_aco ON operations(aco_responsable)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_phases_operation_id ON phases(operation_id)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_ops_date_creation ON operations(date_creation DESC)")
+            
+            # ACO par défaut (ignorés s'ils existent déjà)
             default_aco = [
                 ("Jean MARTIN", "j.martin@spic-guadeloupe.fr", "0590 12 34 56", json.dumps(["OPP", "VEFA"])),
                 ("Marie DUBOIS", "m.dubois@spic-guadeloupe.fr", "0590 12 34 57", json.dumps(["MANDATS_ETUDES", "AMO"])),
@@ -226,270 +301,288 @@ class DatabaseManager:
                 ("Sophie LEROY", "s.leroy@spic-guadeloupe.fr", "0590 12 34 59", json.dumps(["VEFA", "AMO"])),
                 ("Michel PETIT", "m.petit@spic-guadeloupe.fr", "0590 12 34 60", json.dumps(["OPP", "MANDATS_ETUDES"]))
             ]
+            cursor.executemany("INSERT OR IGNORE INTO aco VALUES (?, ?, ?, ?)", default_aco)
             
-            cursor.executemany("INSERT INTO aco VALUES (?, ?, ?, ?)", default_aco)
-            conn.commit()
-        
-        conn.close()
+            self.conn.commit()
     
     def save_operation(self, operation: Operation):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT OR REPLACE INTO operations 
-            (id, nom, type_operation, aco_responsable, date_creation, date_debut, date_fin_prevue, budget, statut)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            operation.id, operation.nom, operation.type_operation, operation.aco_responsable,
-            operation.date_creation.isoformat(), operation.date_debut.isoformat(),
-            operation.date_fin_prevue.isoformat(), operation.budget, operation.statut
-        ))
-        
-        # Supprimer anciennes phases
-        cursor.execute("DELETE FROM phases WHERE operation_id = ?", (operation.id,))
-        
-        # Insérer nouvelles phases
-        for phase in operation.phases:
+        with self.lock:
+            cursor = self.conn.cursor()
+            
             cursor.execute("""
+                INSERT OR REPLACE INTO operations 
+                (id, nom, type_operation, aco_responsable, date_creation, date_debut, date_fin_prevue, budget, statut)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                operation.id, operation.nom, operation.type_operation, operation.aco_responsable,
+                operation.date_creation.isoformat(), operation.date_debut.isoformat(),
+                operation.date_fin_prevue.isoformat(), operation.budget, operation.statut
+            ))
+            
+            # Supprimer anciennes phases
+            cursor.execute("DELETE FROM phases WHERE operation_id = ?", (operation.id,))
+            
+            # Insérer nouvelles phases en un seul lot
+            cursor.executemany("""
                 INSERT INTO phases 
                 (id, operation_id, nom, date_debut, date_fin, couleur, statut, description, responsable, freins)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (
+                    phase.id, operation.id, phase.nom, phase.date_debut.isoformat(),
+                    phase.date_fin.isoformat(), phase.couleur, phase.statut,
+                    phase.description, phase.responsable, orjson.dumps(phase.freins).decode()
+                )
+                for phase in operation.phases
+            ])
+            
+            self.conn.commit()
+            self.version += 1
+    
+    def save_phase(self, operation_id: str, phase: Phase):
+        """Met à jour une seule phase sans réécrire l'opération complète"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            
+            cursor.execute("""
+                UPDATE phases
+                SET nom = ?, date_debut = ?, date_fin = ?, couleur = ?, statut = ?,
+                    description = ?, responsable = ?, freins = ?
+                WHERE id = ? AND operation_id = ?
             """, (
-                phase.id, operation.id, phase.nom, phase.date_debut.isoformat(),
-                phase.date_fin.isoformat(), phase.couleur, phase.statut,
-                phase.description, phase.responsable, json.dumps(phase.freins)
+                phase.nom, phase.date_debut.isoformat(), phase.date_fin.isoformat(),
+                phase.couleur, phase.statut, phase.description, phase.responsable,
+                orjson.dumps(phase.freins).decode(), phase.id, operation_id
             ))
-        
-        conn.commit()
-        conn.close()
+            
+            self.conn.commit()
+            self.version += 1
     
-    def load_operations(self) -> List[Operation]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM operations")
-        operations_data = cursor.fetchall()
-        
-        operations = []
-        for op_data in operations_data:
-            # Charger les phases
-            cursor.execute("SELECT * FROM phases WHERE operation_id = ? ORDER BY date_debut", (op_data[0],))
+    def fetch_operation_rows(self) -> tuple:
+        """Lignes brutes (opérations, phases) telles que renvoyées par SQLite"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            
+            cursor.execute("SELECT * FROM operations")
+            operations_data = cursor.fetchall()
+            
+            # Charger toutes les phases en une seule requête
+            cursor.execute("SELECT * FROM phases ORDER BY operation_id, date_debut")
             phases_data = cursor.fetchall()
+        return operations_data, phases_data
+    
+    def load_operations(self) -> List[Operation]:
+        return build_operations(*self.fetch_operation_rows())
+    
+    def load_kpis(self, depuis: datetime) -> tuple:
+        """Retourne (opérations, créées depuis `depuis`, actives, budget total, phases en retard, phases avec freins)"""
+        with self.lock:
+            cursor = self.conn.cursor()
             
-            phases = []
-            for phase_data in phases_data:
-                phase = Phase(
-                    id=phase_data[0],
-                    nom=phase_data[2],
-                    date_debut=datetime.fromisoformat(phase_data[3]),
-                    date_fin=datetime.fromisoformat(phase_data[4]),
-                    couleur=phase_data[5],
-                    statut=phase_data[6],
-                    description=phase_data[7] or "",
-                    responsable=phase_data[8] or "",
-                    freins=json.loads(phase_data[9] or "[]")
-                )
-                phases.append(phase)
+            cursor.execute("""
+                SELECT COUNT(*),
+                       COALESCE(SUM(date_creation > ?), 0),
+                       COALESCE(SUM(CASE WHEN statut IN ('En cours', 'Créée') THEN 1 ELSE 0 END), 0),
+                       COALESCE(SUM(budget), 0),
+                       (SELECT COUNT(*) FROM phases WHERE statut = 'Retard'),
+                       (SELECT COUNT(*) FROM phases WHERE freins NOT IN ('[]', '', 'null'))
+                FROM operations
+            """, (depuis.isoformat(),))
+            return cursor.fetchone()
+    
+    def load_phase_stats(self) -> Dict[str, tuple]:
+        """Retourne par opération : (nb phases, terminées, en retard, avec freins)"""
+        with self.lock:
+            cursor = self.conn.cursor()
             
-            operation = Operation(
-                id=op_data[0],
-                nom=op_data[1],
-                type_operation=op_data[2],
-                aco_responsable=op_data[3],
-                date_creation=datetime.fromisoformat(op_data[4]),
-                date_debut=datetime.fromisoformat(op_data[5]),
-                date_fin_prevue=datetime.fromisoformat(op_data[6]),
-                budget=op_data[7],
-                statut=op_data[8],
-                phases=phases
-            )
-            operations.append(operation)
-        
-        conn.close()
-        return operations
+            cursor.execute("""
+                SELECT operation_id,
+                       COUNT(*),
+                       SUM(statut = 'Terminé'),
+                       SUM(statut = 'Retard'),
+                       SUM(CASE WHEN freins IS NOT NULL AND freins <> '[]' THEN 1 ELSE 0 END)
+                FROM phases
+                GROUP BY operation_id
+            """)
+            return {row[0]: row[1:] for row in cursor.fetchall()}
+    
+    def fetch_aco_rows(self) -> tuple:
+        """Lignes brutes des ACO et statistiques {nom: (opérations actives, budget total)}"""
+        with self.lock:
+            cursor = self.conn.cursor()
+            
+            cursor.execute("SELECT * FROM aco")
+            aco_data = cursor.fetchall()
+            
+            # Statistiques par ACO calculées directement par SQLite
+            cursor.execute("""
+                SELECT aco_responsable,
+                       SUM(CASE WHEN statut IN ('En cours', 'Créée') THEN 1 ELSE 0 END),
+                       COALESCE(SUM(budget), 0)
+                FROM operations
+                GROUP BY aco_responsable
+            """)
+            aco_stats = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        return aco_data, aco_stats
     
     def load_aco(self) -> List[ACO]:
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM aco")
-        aco_data = cursor.fetchall()
-        
-        operations = self.load_operations()
-        
-        aco_list = []
-        for aco_record in aco_data:
-            # Calculer statistiques pour cet ACO
-            aco_operations = [op for op in operations if op.aco_responsable == aco_record[0]]
-            operations_en_cours = len([op for op in aco_operations if op.statut in ["En cours", "Créée"]])
-            total_budget = sum(op.budget for op in aco_operations)
-            
-            aco = ACO(
-                nom=aco_record[0],
-                email=aco_record[1],
-                telephone=aco_record[2],
-                specialites=json.loads(aco_record[3]),
-                operations_en_cours=operations_en_cours,
-                total_budget=total_budget
-            )
-            aco_list.append(aco)
-        
-        conn.close()
-        return aco_list
+        return build_aco(*self.fetch_aco_rows())
+
+# Phase d'un template métier : immuable et partagée entre toutes les sessions
+PhaseTemplate = namedtuple("PhaseTemplate", "nom duree_jours couleur")
 
 # ===== TEMPLATES MÉTIER EXACTS CORRIGÉS (100+ PHASES AUTORISÉES) =====
-TEMPLATES_PHASES = {
+TEMPLATES_PHASES = MappingProxyType({
     # ===== OPP COMPLET (45 phases) =====
-    "OPP": [
+    "OPP": (
         # Phase identification et faisabilité
-        {"nom": "Opportunité foncière identifiée", "duree_jours": 7, "couleur": "#2ca02c"},
-        {"nom": "Faisabilité technique et financière", "duree_jours": 30, "couleur": "#2ca02c"},
-        {"nom": "Validation programme", "duree_jours": 15, "couleur": "#2ca02c"},
-        {"nom": "Acquisition foncier", "duree_jours": 90, "couleur": "#1f77b4"},
-        {"nom": "Études géotechniques", "duree_jours": 30, "couleur": "#1f77b4"},
-        {"nom": "Levée topographique", "duree_jours": 15, "couleur": "#1f77b4"},
-        {"nom": "Étude environnementale", "duree_jours": 45, "couleur": "#1f77b4"},
-        {"nom": "Consultation architecte", "duree_jours": 30, "couleur": "#ff7f0e"},
-        {"nom": "Attribution marché MOE", "duree_jours": 15, "couleur": "#ff7f0e"},
-        {"nom": "Notification MOE", "duree_jours": 7, "couleur": "#ff7f0e"},
+        PhaseTemplate("Opportunité foncière identifiée", 7, "#2ca02c"),
+        PhaseTemplate("Faisabilité technique et financière", 30, "#2ca02c"),
+        PhaseTemplate("Validation programme", 15, "#2ca02c"),
+        PhaseTemplate("Acquisition foncier", 90, "#1f77b4"),
+        PhaseTemplate("Études géotechniques", 30, "#1f77b4"),
+        PhaseTemplate("Levée topographique", 15, "#1f77b4"),
+        PhaseTemplate("Étude environnementale", 45, "#1f77b4"),
+        PhaseTemplate("Consultation architecte", 30, "#ff7f0e"),
+        PhaseTemplate("Attribution marché MOE", 15, "#ff7f0e"),
+        PhaseTemplate("Notification MOE", 7, "#ff7f0e"),
         
         # Phase conception
-        {"nom": "Phase ESQ (Esquisse)", "duree_jours": 30, "couleur": "#9467bd"},
-        {"nom": "Phase APS (Avant-Projet Sommaire)", "duree_jours": 45, "couleur": "#9467bd"},
-        {"nom": "Phase APD (Avant-Projet Définitif)", "duree_jours": 60, "couleur": "#9467bd"},
-        {"nom": "Dépôt Permis de Construire", "duree_jours": 7, "couleur": "#d62728"},
-        {"nom": "Instruction PC", "duree_jours": 120, "couleur": "#d62728"},
-        {"nom": "Obtention PC", "duree_jours": 15, "couleur": "#d62728"},
-        {"nom": "Purge recours PC", "duree_jours": 60, "couleur": "#d62728"},
-        {"nom": "Phase PRO (Projet)", "duree_jours": 60, "couleur": "#8c564b"},
-        {"nom": "Préparation DCE", "duree_jours": 30, "couleur": "#8c564b"},
-        {"nom": "Consultation SPS", "duree_jours": 30, "couleur": "#8c564b"},
+        PhaseTemplate("Phase ESQ (Esquisse)", 30, "#9467bd"),
+        PhaseTemplate("Phase APS (Avant-Projet Sommaire)", 45, "#9467bd"),
+        PhaseTemplate("Phase APD (Avant-Projet Définitif)", 60, "#9467bd"),
+        PhaseTemplate("Dépôt Permis de Construire", 7, "#d62728"),
+        PhaseTemplate("Instruction PC", 120, "#d62728"),
+        PhaseTemplate("Obtention PC", 15, "#d62728"),
+        PhaseTemplate("Purge recours PC", 60, "#d62728"),
+        PhaseTemplate("Phase PRO (Projet)", 60, "#8c564b"),
+        PhaseTemplate("Préparation DCE", 30, "#8c564b"),
+        PhaseTemplate("Consultation SPS", 30, "#8c564b"),
         
         # Phase consultation entreprises
-        {"nom": "Lancement consultation entreprises", "duree_jours": 7, "couleur": "#e377c2"},
-        {"nom": "Analyse offres", "duree_jours": 30, "couleur": "#e377c2"},
-        {"nom": "Attribution marchés travaux", "duree_jours": 20, "couleur": "#e377c2"},
-        {"nom": "Signature marchés", "duree_jours": 15, "couleur": "#e377c2"},
-        {"nom": "Préparation chantier", "duree_jours": 30, "couleur": "#7f7f7f"},
-        {"nom": "Installation chantier", "duree_jours": 10, "couleur": "#7f7f7f"},
-        {"nom": "Ordre de service", "duree_jours": 3, "couleur": "#7f7f7f"},
+        PhaseTemplate("Lancement consultation entreprises", 7, "#e377c2"),
+        PhaseTemplate("Analyse offres", 30, "#e377c2"),
+        PhaseTemplate("Attribution marchés travaux", 20, "#e377c2"),
+        PhaseTemplate("Signature marchés", 15, "#e377c2"),
+        PhaseTemplate("Préparation chantier", 30, "#7f7f7f"),
+        PhaseTemplate("Installation chantier", 10, "#7f7f7f"),
+        PhaseTemplate("Ordre de service", 3, "#7f7f7f"),
         
         # Phase travaux
-        {"nom": "Travaux VRD", "duree_jours": 60, "couleur": "#bcbd22"},
-        {"nom": "Travaux terrassement", "duree_jours": 30, "couleur": "#bcbd22"},
-        {"nom": "Travaux fondations", "duree_jours": 45, "couleur": "#bcbd22"},
-        {"nom": "Travaux gros œuvre", "duree_jours": 120, "couleur": "#17becf"},
-        {"nom": "Travaux étanchéité", "duree_jours": 30, "couleur": "#17becf"},
-        {"nom": "Travaux charpente", "duree_jours": 45, "couleur": "#17becf"},
-        {"nom": "Travaux couverture", "duree_jours": 30, "couleur": "#17becf"},
-        {"nom": "Travaux cloisons", "duree_jours": 45, "couleur": "#aec7e8"},
-        {"nom": "Travaux électricité", "duree_jours": 60, "couleur": "#aec7e8"},
-        {"nom": "Travaux plomberie", "duree_jours": 60, "couleur": "#aec7e8"},
-        {"nom": "Travaux climatisation", "duree_jours": 45, "couleur": "#aec7e8"},
-        {"nom": "Travaux revêtements", "duree_jours": 60, "couleur": "#ffbb78"},
-        {"nom": "Travaux peinture", "duree_jours": 45, "couleur": "#ffbb78"},
-        {"nom": "Travaux menuiseries", "duree_jours": 30, "couleur": "#ffbb78"},
+        PhaseTemplate("Travaux VRD", 60, "#bcbd22"),
+        PhaseTemplate("Travaux terrassement", 30, "#bcbd22"),
+        PhaseTemplate("Travaux fondations", 45, "#bcbd22"),
+        PhaseTemplate("Travaux gros œuvre", 120, "#17becf"),
+        PhaseTemplate("Travaux étanchéité", 30, "#17becf"),
+        PhaseTemplate("Travaux charpente", 45, "#17becf"),
+        PhaseTemplate("Travaux couverture", 30, "#17becf"),
+        PhaseTemplate("Travaux cloisons", 45, "#aec7e8"),
+        PhaseTemplate("Travaux électricité", 60, "#aec7e8"),
+        PhaseTemplate("Travaux plomberie", 60, "#aec7e8"),
+        PhaseTemplate("Travaux climatisation", 45, "#aec7e8"),
+        PhaseTemplate("Travaux revêtements", 60, "#ffbb78"),
+        PhaseTemplate("Travaux peinture", 45, "#ffbb78"),
+        PhaseTemplate("Travaux menuiseries", 30, "#ffbb78"),
         
         # Phase raccordements
-        {"nom": "Raccordement EDF", "duree_jours": 45, "couleur": "#98df8a"},
-        {"nom": "Raccordement eau", "duree_jours": 30, "couleur": "#98df8a"},
-        {"nom": "Raccordement fibre", "duree_jours": 20, "couleur": "#98df8a"},
-        {"nom": "Raccordement assainissement", "duree_jours": 30, "couleur": "#98df8a"},
-        {"nom": "Nettoyage final", "duree_jours": 10, "couleur": "#ff9896"}
-    ],
+        PhaseTemplate("Raccordement EDF", 45, "#98df8a"),
+        PhaseTemplate("Raccordement eau", 30, "#98df8a"),
+        PhaseTemplate("Raccordement fibre", 20, "#98df8a"),
+        PhaseTemplate("Raccordement assainissement", 30, "#98df8a"),
+        PhaseTemplate("Nettoyage final", 10, "#ff9896")
+    ),
     
     # ===== VEFA COMPLET (25 phases) =====
-    "VEFA": [
-        {"nom": "Recherche programmes VEFA", "duree_jours": 30, "couleur": "#2ca02c"},
-        {"nom": "Analyse promoteurs", "duree_jours": 20, "couleur": "#2ca02c"},
-        {"nom": "Négociation conditions", "duree_jours": 30, "couleur": "#2ca02c"},
-        {"nom": "Due diligence technique", "duree_jours": 15, "couleur": "#1f77b4"},
-        {"nom": "Due diligence juridique", "duree_jours": 15, "couleur": "#1f77b4"},
-        {"nom": "Due diligence financière", "duree_jours": 10, "couleur": "#1f77b4"},
-        {"nom": "Validation interne SPIC", "duree_jours": 15, "couleur": "#ff7f0e"},
-        {"nom": "Signature contrat VEFA", "duree_jours": 7, "couleur": "#ff7f0e"},
-        {"nom": "Appel de fonds 1 (35%)", "duree_jours": 3, "couleur": "#ff7f0e"},
-        {"nom": "Suivi travaux fondations", "duree_jours": 60, "couleur": "#d62728"},
-        {"nom": "Suivi travaux gros œuvre", "duree_jours": 120, "couleur": "#d62728"},
-        {"nom": "Appel de fonds 2 (70%)", "duree_jours": 3, "couleur": "#d62728"},
-        {"nom": "Suivi travaux second œuvre", "duree_jours": 90, "couleur": "#9467bd"},
-        {"nom": "Suivi travaux finitions", "duree_jours": 60, "couleur": "#9467bd"},
-        {"nom": "Suivi raccordements", "duree_jours": 30, "couleur": "#9467bd"},
-        {"nom": "Pré-visite SPIC", "duree_jours": 7, "couleur": "#8c564b"},
-        {"nom": "Pré-réception promoteur", "duree_jours": 15, "couleur": "#8c564b"},
-        {"nom": "Levée réserves", "duree_jours": 60, "couleur": "#8c564b"},
-        {"nom": "Réception définitive", "duree_jours": 7, "couleur": "#bcbd22"},
-        {"nom": "Appel de fonds final (95%)", "duree_jours": 3, "couleur": "#bcbd22"},
-        {"nom": "Remise clés", "duree_jours": 3, "couleur": "#bcbd22"},
-        {"nom": "Livraison locataires", "duree_jours": 30, "couleur": "#17becf"},
-        {"nom": "Solde final (5%)", "duree_jours": 7, "couleur": "#17becf"},
-        {"nom": "DGD VEFA", "duree_jours": 30, "couleur": "#17becf"},
-        {"nom": "Bilan opération VEFA", "duree_jours": 15, "couleur": "#17becf"}
-    ],
+    "VEFA": (
+        PhaseTemplate("Recherche programmes VEFA", 30, "#2ca02c"),
+        PhaseTemplate("Analyse promoteurs", 20, "#2ca02c"),
+        PhaseTemplate("Négociation conditions", 30, "#2ca02c"),
+        PhaseTemplate("Due diligence technique", 15, "#1f77b4"),
+        PhaseTemplate("Due diligence juridique", 15, "#1f77b4"),
+        PhaseTemplate("Due diligence financière", 10, "#1f77b4"),
+        PhaseTemplate("Validation interne SPIC", 15, "#ff7f0e"),
+        PhaseTemplate("Signature contrat VEFA", 7, "#ff7f0e"),
+        PhaseTemplate("Appel de fonds 1 (35%)", 3, "#ff7f0e"),
+        PhaseTemplate("Suivi travaux fondations", 60, "#d62728"),
+        PhaseTemplate("Suivi travaux gros œuvre", 120, "#d62728"),
+        PhaseTemplate("Appel de fonds 2 (70%)", 3, "#d62728"),
+        PhaseTemplate("Suivi travaux second œuvre", 90, "#9467bd"),
+        PhaseTemplate("Suivi travaux finitions", 60, "#9467bd"),
+        PhaseTemplate("Suivi raccordements", 30, "#9467bd"),
+        PhaseTemplate("Pré-visite SPIC", 7, "#8c564b"),
+        PhaseTemplate("Pré-réception promoteur", 15, "#8c564b"),
+        PhaseTemplate("Levée réserves", 60, "#8c564b"),
+        PhaseTemplate("Réception définitive", 7, "#bcbd22"),
+        PhaseTemplate("Appel de fonds final (95%)", 3, "#bcbd22"),
+        PhaseTemplate("Remise clés", 3, "#bcbd22"),
+        PhaseTemplate("Livraison locataires", 30, "#17becf"),
+        PhaseTemplate("Solde final (5%)", 7, "#17becf"),
+        PhaseTemplate("DGD VEFA", 30, "#17becf"),
+        PhaseTemplate("Bilan opération VEFA", 15, "#17becf")
+    ),
     
     # ===== MANDATS_ETUDES EXACT (14 phases) =====
-    "MANDATS_ETUDES": [
-        {"nom": "Signature convention mandat", "duree_jours": 7, "couleur": "#2ca02c"},
-        {"nom": "Définition besoins/programme", "duree_jours": 20, "couleur": "#2ca02c"},
-        {"nom": "Diagnostic technique/urbain", "duree_jours": 30, "couleur": "#1f77b4"},
-        {"nom": "Études de faisabilité", "duree_jours": 45, "couleur": "#1f77b4"},
-        {"nom": "Lancement consultation programmiste", "duree_jours": 15, "couleur": "#ff7f0e"},
-        {"nom": "Attribution/notification programmiste", "duree_jours": 10, "couleur": "#ff7f0e"},
-        {"nom": "Lancement consultation MOE urbaine", "duree_jours": 20, "couleur": "#d62728"},
-        {"nom": "Attribution/notification MOE urbaine", "duree_jours": 15, "couleur": "#d62728"},
-        {"nom": "Démarrage études (OS)", "duree_jours": 5, "couleur": "#9467bd"},
-        {"nom": "Concertation/validation intermédiaire", "duree_jours": 30, "couleur": "#9467bd"},
-        {"nom": "Remise livrables intermédiaires", "duree_jours": 15, "couleur": "#8c564b"},
-        {"nom": "Remise livrables finaux", "duree_jours": 20, "couleur": "#8c564b"},
-        {"nom": "Validation mandant", "duree_jours": 15, "couleur": "#bcbd22"},
-        {"nom": "Clôture mandat", "duree_jours": 10, "couleur": "#17becf"}
-    ],
+    "MANDATS_ETUDES": (
+        PhaseTemplate("Signature convention mandat", 7, "#2ca02c"),
+        PhaseTemplate("Définition besoins/programme", 20, "#2ca02c"),
+        PhaseTemplate("Diagnostic technique/urbain", 30, "#1f77b4"),
+        PhaseTemplate("Études de faisabilité", 45, "#1f77b4"),
+        PhaseTemplate("Lancement consultation programmiste", 15, "#ff7f0e"),
+        PhaseTemplate("Attribution/notification programmiste", 10, "#ff7f0e"),
+        PhaseTemplate("Lancement consultation MOE urbaine", 20, "#d62728"),
+        PhaseTemplate("Attribution/notification MOE urbaine", 15, "#d62728"),
+        PhaseTemplate("Démarrage études (OS)", 5, "#9467bd"),
+        PhaseTemplate("Concertation/validation intermédiaire", 30, "#9467bd"),
+        PhaseTemplate("Remise livrables intermédiaires", 15, "#8c564b"),
+        PhaseTemplate("Remise livrables finaux", 20, "#8c564b"),
+        PhaseTemplate("Validation mandant", 15, "#bcbd22"),
+        PhaseTemplate("Clôture mandat", 10, "#17becf")
+    ),
     
     # ===== MANDATS_REALISATION EXACT (21 phases) =====
-    "MANDATS_REALISATION": [
-        {"nom": "Signature convention mandat", "duree_jours": 7, "couleur": "#2ca02c"},
-        {"nom": "Lancement consultation MOE", "duree_jours": 30, "couleur": "#2ca02c"},
-        {"nom": "Attribution/notification MOE", "duree_jours": 15, "couleur": "#2ca02c"},
-        {"nom": "OS études conception", "duree_jours": 5, "couleur": "#1f77b4"},
-        {"nom": "Phase DIAG (si rénovation)", "duree_jours": 20, "couleur": "#1f77b4"},
-        {"nom": "Phase ESQ (Esquisse)", "duree_jours": 30, "couleur": "#1f77b4"},
-        {"nom": "Phase APS (Avant-Projet Sommaire)", "duree_jours": 45, "couleur": "#ff7f0e"},
-        {"nom": "Phase APD (Avant-Projet Définitif)", "duree_jours": 60, "couleur": "#ff7f0e"},
-        {"nom": "Phase PRO-DCE (Projet-DCE)", "duree_jours": 45, "couleur": "#ff7f0e"},
-        {"nom": "Lancement consultation entreprises", "duree_jours": 30, "couleur": "#d62728"},
-        {"nom": "Attribution/notification marchés", "duree_jours": 20, "couleur": "#d62728"},
-        {"nom": "OS travaux", "duree_jours": 5, "couleur": "#d62728"},
-        {"nom": "Phase EXE (Études exécution)", "duree_jours": 30, "couleur": "#9467bd"},
-        {"nom": "Démarrage travaux", "duree_jours": 10, "couleur": "#9467bd"},
-        {"nom": "Suivi chantier", "duree_jours": 240, "couleur": "#9467bd"},
-        {"nom": "Réception provisoire", "duree_jours": 15, "couleur": "#8c564b"},
-        {"nom": "Levée réserves", "duree_jours": 60, "couleur": "#8c564b"},
-        {"nom": "Réception définitive", "duree_jours": 15, "couleur": "#8c564b"},
-        {"nom": "DGD (Décompte Général)", "duree_jours": 30, "couleur": "#bcbd22"},
-        {"nom": "GPA (Garantie Parfait Achèvement)", "duree_jours": 365, "couleur": "#bcbd22"},
-        {"nom": "Clôture mandat", "duree_jours": 15, "couleur": "#17becf"}
-    ],
+    "MANDATS_REALISATION": (
+        PhaseTemplate("Signature convention mandat", 7, "#2ca02c"),
+        PhaseTemplate("Lancement consultation MOE", 30, "#2ca02c"),
+        PhaseTemplate("Attribution/notification MOE", 15, "#2ca02c"),
+        PhaseTemplate("OS études conception", 5, "#1f77b4"),
+        PhaseTemplate("Phase DIAG (si rénovation)", 20, "#1f77b4"),
+        PhaseTemplate("Phase ESQ (Esquisse)", 30, "#1f77b4"),
+        PhaseTemplate("Phase APS (Avant-Projet Sommaire)", 45, "#ff7f0e"),
+        PhaseTemplate("Phase APD (Avant-Projet Définitif)", 60, "#ff7f0e"),
+        PhaseTemplate("Phase PRO-DCE (Projet-DCE)", 45, "#ff7f0e"),
+        PhaseTemplate("Lancement consultation entreprises", 30, "#d62728"),
+        PhaseTemplate("Attribution/notification marchés", 20, "#d62728"),
+        PhaseTemplate("OS travaux", 5, "#d62728"),
+        PhaseTemplate("Phase EXE (Études exécution)", 30, "#9467bd"),
+        PhaseTemplate("Démarrage travaux", 10, "#9467bd"),
+        PhaseTemplate("Suivi chantier", 240, "#9467bd"),
+        PhaseTemplate("Réception provisoire", 15, "#8c564b"),
+        PhaseTemplate("Levée réserves", 60, "#8c564b"),
+        PhaseTemplate("Réception définitive", 15, "#8c564b"),
+        PhaseTemplate("DGD (Décompte Général)", 30, "#bcbd22"),
+        PhaseTemplate("GPA (Garantie Parfait Achèvement)", 365, "#bcbd22"),
+        PhaseTemplate("Clôture mandat", 15, "#17becf")
+    ),
     
     # ===== AMO EXACT (15 phases) =====
-    "AMO": [
-        {"nom": "Signature marché AMO", "duree_jours": 7, "couleur": "#2ca02c"},
-        {"nom": "Assistance définition besoins", "duree_jours": 30, "couleur": "#2ca02c"},
-        {"nom": "Assistance retenir MOE", "duree_jours": 45, "couleur": "#2ca02c"},
-        {"nom": "Suivi études conception", "duree_jours": 120, "couleur": "#1f77b4"},
-        {"nom": "Assistance rédaction pièces", "duree_jours": 30, "couleur": "#1f77b4"},
-        {"nom": "Assistance retenir OPC/CT/SPS", "duree_jours": 20, "couleur": "#ff7f0e"},
-        {"nom": "Assistance marchés entreprises", "duree_jours": 60, "couleur": "#ff7f0e"},
-        {"nom": "Suivi exécution travaux", "duree_jours": 240, "couleur": "#d62728"},
-        {"nom": "Assistance réceptions", "duree_jours": 30, "couleur": "#d62728"},
-        {"nom": "Assistance DGD", "duree_jours": 45, "couleur": "#9467bd"},
-        {"nom": "Suivi GPA", "duree_jours": 365, "couleur": "#9467bd"},
-        {"nom": "Assistance clôture", "duree_jours": 20, "couleur": "#8c564b"},
-        {"nom": "Bilan mission AMO", "duree_jours": 15, "couleur": "#8c564b"},
-        {"nom": "Retour d'expérience", "duree_jours": 10, "couleur": "#bcbd22"},
-        {"nom": "Clôture mission", "duree_jours": 5, "couleur": "#17becf"}
-    ]
-}
+    "AMO": (
+        PhaseTemplate("Signature marché AMO", 7, "#2ca02c"),
+        PhaseTemplate("Assistance définition besoins", 30, "#2ca02c"),
+        PhaseTemplate("Assistance retenir MOE", 45, "#2ca02c"),
+        PhaseTemplate("Suivi études conception", 120, "#1f77b4"),
+        PhaseTemplate("Assistance rédaction pièces", 30, "#1f77b4"),
+        PhaseTemplate("Assistance retenir OPC/CT/SPS", 20, "#ff7f0e"),
+        PhaseTemplate("Assistance marchés entreprises", 60, "#ff7f0e"),
+        PhaseTemplate("Suivi exécution travaux", 240, "#d62728"),
+        PhaseTemplate("Assistance réceptions", 30, "#d62728"),
+        PhaseTemplate("Assistance DGD", 45, "#9467bd"),
+        PhaseTemplate("Suivi GPA", 365, "#9467bd"),
+        PhaseTemplate("Assistance clôture", 20, "#8c564b"),
+        PhaseTemplate("Bilan mission AMO", 15, "#8c564b"),
+        PhaseTemplate("Retour d'expérience", 10, "#bcbd22"),
+        PhaseTemplate("Clôture mission", 5, "#17becf")
+    )
+})
 
 # ===== UNITÉS DE DURÉE MULTIPLES =====
 UNITES_DUREE = {
@@ -511,104 +604,373 @@ def format_duration(jours: int) -> str:
     else:
         return f"{jours} jours"
 
+# Le script est réexécuté à chaque interaction : la liste formatée est mémorisée par st.cache_data
+@st.cache_data
+def rendu_template_phases(type_operation: str) -> str:
+    """Liste markdown des phases d'un template, formatée une seule fois par type d'opération"""
+    return "\n\n".join(
+        f"**{i+1}.** {phase_template.nom} - *{format_duration(phase_template.duree_jours)}*"
+        for i, phase_template in enumerate(TEMPLATES_PHASES[type_operation])
+    )
+
+def compter_phases(operation: Operation) -> tuple:
+    """Compte en un seul passage les phases terminées, en retard et avec freins"""
+    terminees = retard = freins = 0
+    for p in operation.phases:
+        statut = p.statut[0] if isinstance(p.statut, list) and p.statut else p.statut
+        terminees += statut == "Terminé"
+        retard += statut == "Retard"
+        freins += bool(p.freins)
+    return terminees, retard, freins
+
+def generer_ids(n: int) -> List[str]:
+    """Génère n identifiants UUID4 à partir d'un seul appel à os.urandom"""
+    octets = os.urandom(16 * n)
+    return [str(uuid.UUID(bytes=octets[i:i + 16], version=4)) for i in range(0, 16 * n, 16)]
+
 # Initialisation de la base de données
 @st.cache_resource
 def get_database():
     return DatabaseManager()
 
+# Données mémorisées par version (DatabaseManager.version, partagée entre sessions) : uniquement des
+# tuples, types natifs et DataFrames. Les dataclasses, redéfinies à chaque exécution du script, ne
+# passent pas par st.cache_data ; les pages ne les construisent que pour l'opération qu'elles modifient.
+@st.cache_data(ttl=300)
+def cached_operation_rows(version: int) -> tuple:
+    """Lignes (opérations, phases) et tranche {id opération: (début, fin)} de ses phases"""
+    operations_data, phases_data = get_database().fetch_operation_rows()
+    # Phases triées par opération : celles d'une opération sont contiguës
+    tranches = {}
+    for i, phase_data in enumerate(phases_data):
+        debut, _ = tranches.get(phase_data[1], (i, i))
+        tranches[phase_data[1]] = (debut, i + 1)
+    return operations_data, phases_data, tranches
+
+@st.cache_data(ttl=300)
+def cached_aco_rows(version: int) -> tuple:
+    return get_database().fetch_aco_rows()
+
+@st.cache_data(ttl=300)
+def cached_operation_index(version: int) -> tuple:
+    """Libellés des opérations, libellé -> ID et ID -> position dans les libellés"""
+    operations_data = cached_operation_rows(version)[0]
+    operation_names = [f"{op_data[1]} ({op_data[2]})" for op_data in operations_data]
+    # Parcours inversé : en cas de doublon, la première opération l'emporte
+    display_to_id = {
+        name: op_data[0] for name, op_data in reversed(list(zip(operation_names, operations_data)))
+    }
+    id_to_index = {op_data[0]: i for i, op_data in enumerate(operations_data)}
+    return operation_names, display_to_id, id_to_index
+
+@st.cache_data(ttl=300, max_entries=64)
+def cached_operation_detail(version: int, operation_id: str) -> Optional[tuple]:
+    """Lignes (opération, phases) d'une opération, None si elle n'existe pas dans cette version"""
+    operations_data, phases_data, tranches = cached_operation_rows(version)
+    position = cached_operation_index(version)[2].get(operation_id)
+    if position is None:
+        return None
+    debut, fin = tranches.get(operation_id, (0, 0))
+    return operations_data[position], phases_data[debut:fin]
+
+def construire_operation(version: int, operation_id: str) -> Optional[Operation]:
+    """Opération construite à partir de ses lignes mémorisées, pour l'afficher et la modifier"""
+    detail = cached_operation_detail(version, operation_id)
+    if detail is None:
+        return None
+    op_data, phases_rows = detail
+    return build_operations([op_data], phases_rows)[0]
+
+def construire_phase(version: int, operation_id: str, phase_id: str) -> tuple:
+    """(opération, phase) construites pour une action sur une phase, (None, None) si introuvable"""
+    operation = construire_operation(version, operation_id)
+    phase = next((p for p in operation.phases if p.id == phase_id), None) if operation else None
+    return (operation, phase) if phase else (None, None)
+
+def construire_operations(version: int) -> List[Operation]:
+    """Toutes les opérations, construites pour calculer les données mémorisées ci-dessous"""
+    operations_data, phases_data, _ = cached_operation_rows(version)
+    return build_operations(operations_data, phases_data)
+
+def construire_aco(version: int) -> List[ACO]:
+    """ACO (quelques lignes) construits à partir des lignes mémorisées"""
+    return build_aco(*cached_aco_rows(version))
+
+@st.cache_data(ttl=300)
+def cached_kpis(version: int, depuis: datetime) -> tuple:
+    """KPIs du dashboard (voir DatabaseManager.load_kpis), mémorisés par version et date de référence"""
+    return get_database().load_kpis(depuis)
+
+@st.cache_data(ttl=300)
+def cached_phase_stats(version: int) -> Dict[str, tuple]:
+    """Compteurs de phases par opération (voir DatabaseManager.load_phase_stats)"""
+    return get_database().load_phase_stats()
+
+@st.cache_data(ttl=300)
+def cached_dashboard_tables(version: int) -> tuple:
+    """Table à plat des opérations pour les agrégats et tableau des 10 plus récentes (index = ID)"""
+    df_ops = pd.DataFrame(
+        [(op_data[0], op_data[1], op_data[2], op_data[3], op_data[4], op_data[7], op_data[8])
+         for op_data in cached_operation_rows(version)[0]],
+        columns=['id', 'nom', 'type_operation', 'aco_responsable', 'date_creation', 'budget', 'statut']
+    )
+    df_ops['date_creation'] = pd.to_datetime(df_ops['date_creation'], format="ISO8601")
+    
+    # Compteurs de phases par opération, calculés par SQLite
+    phase_stats = cached_phase_stats(version)
+    
+    # 10 plus récentes, par date de création décroissante
+    data = []
+    for op in df_ops.sort_values('date_creation', ascending=False, kind='stable').head(10).itertuples():
+        phases_count, phases_completed, phases_retard, phases_freins = phase_stats.get(op.id, (0, 0, 0, 0))
+        progress = f"{phases_completed}/{phases_count}" if phases_count > 0 else "0/0"
+        
+        # Indicateur de statut
+        status_indicator = "🟢" if phases_retard == 0 else "🔴"
+        if phases_freins:
+            status_indicator = "🟠"
+        
+        data.append({
+            "🎯": status_indicator,
+            "Nom": op.nom,
+            "Type": op.type_operation,
+            "ACO": op.aco_responsable,
+            "Statut": op.statut,
+            "Budget": f"{op.budget:,.0f} €",
+            "Progression": progress,
+            "Créée le": op.date_creation.strftime("%d/%m/%Y"),
+            "ID": op.id  # Index caché pour sélection
+        })
+    df_recent = pd.DataFrame(data).set_index('ID') if data else pd.DataFrame()
+    return df_ops, df_recent
+
+@st.cache_data(ttl=300)
+def cached_operation_labels(version: int) -> Dict[str, tuple]:
+    """(nom, ACO responsable) par ID d'opération, pour la barre latérale"""
+    return {op_data[0]: (op_data[1], op_data[3]) for op_data in cached_operation_rows(version)[0]}
+
+@st.cache_data(ttl=300)
+def cached_ops_by_aco(version: int) -> Dict[str, List[int]]:
+    """Positions des opérations regroupées par ACO responsable, en une seule passe"""
+    ops_by_aco = defaultdict(list)
+    for i, op_data in enumerate(cached_operation_rows(version)[0]):
+        ops_by_aco[op_data[3]].append(i)
+    return dict(ops_by_aco)
+
+@st.cache_data(ttl=300)
+def cached_aco_operations_df(version: int, aco_nom: str) -> tuple:
+    """Tableau des opérations d'un ACO, avec les (id, nom) des lignes pour la navigation"""
+    lignes, indicateurs, noms, types, statuts, budgets = [], [], [], [], [], []
+    progressions, retards, freins, creees = [], [], [], []
+    operations = construire_operations(version)
+    for op in (operations[i] for i in cached_ops_by_aco(version).get(aco_nom, [])):
+        phases_completed, phases_retard, phases_freins = compter_phases(op)
+        lignes.append((op.id, op.nom))
+        indicateurs.append("🔴" if phases_retard > 0 else "🟠" if phases_freins > 0 else "🟢")
+        noms.append(op.nom)
+        types.append(op.type_operation)
+        statuts.append(op.statut)
+        budgets.append(f"{op.budget:,.0f} €")
+        progressions.append(f"{phases_completed}/{len(op.phases)}")
+        retards.append(phases_retard)
+        freins.append(phases_freins)
+        creees.append(op.date_creation.strftime("%d/%m/%Y"))
+    
+    df = pd.DataFrame({
+        "🎯": indicateurs,
+        "Nom": noms,
+        "Type": types,
+        "Statut": statuts,
+        "Budget": budgets,
+        "Progression": progressions,
+        "Retards": retards,
+        "Freins": freins,
+        "Créée": creees
+    })
+    return df, lignes
+
+@st.cache_data(ttl=300)
+def cached_phase_alerts(version: int) -> tuple:
+    """Phases en retard et phases avec freins, en tuples (op_id, op_nom, phase_nom, nb_freins)"""
+    operations = construire_operations(version)
+    retard_phases = [
+        (op.id, op.nom, phase.nom, len(phase.freins))
+        for op in operations for phase in op.phases if phase.statut == "Retard"
+    ]
+    frein_phases = [
+        (op.id, op.nom, phase.nom, len(phase.freins))
+        for op in operations for phase in op.phases if phase.freins
+    ]
+    return retard_phases, frein_phases
+
+@st.cache_data(ttl=300)
+def cached_aco_stats(version: int) -> Dict[str, dict]:
+    """Statistiques de performance par ACO, calculées en une seule passe sur les opérations"""
+    stats = defaultdict(lambda: {"ops": 0, "retard": 0, "freins": 0, "budget": 0.0})
+    for op in construire_operations(version):
+        aco_stats = stats[op.aco_responsable]
+        aco_stats["ops"] += 1
+        aco_stats["budget"] += op.budget
+        for phase in op.phases:
+            aco_stats["retard"] += phase.statut == "Retard"
+            aco_stats["freins"] += bool(phase.freins)
+    
+    for aco_stats in stats.values():
+        aco_stats["budget_moyen"] = aco_stats["budget"] / aco_stats["ops"]
+    return dict(stats)
+
+@st.cache_data(ttl=300)
+def cached_phases_df(version: int) -> pd.DataFrame:
+    """Table à plat des phases (une ligne par phase) pour les calculs vectorisés des alertes"""
+    operations = construire_operations(version)
+    phases_df = pd.DataFrame(
+        [
+            (
+                op.id, op.nom, op.aco_responsable, op.type_operation,
+                phase.id, phase.nom, phase.statut, len(phase.freins), ", ".join(phase.freins),
+                phase.date_debut, phase.date_fin
+            )
+            for op in operations for phase in op.phases
+        ],
+        columns=[
+            "op_id", "op_nom", "aco", "type_operation",
+            "phase_id", "phase_nom", "statut", "n_freins", "freins",
+            "date_debut", "date_fin"
+        ]
+    )
+    phases_df["is_retard"] = phases_df["statut"].eq("Retard")
+    phases_df["gravite"] = phases_df["n_freins"].gt(2).map({True: "Élevée", False: "Modérée"})
+    # Peu d'ACO distincts : catégories = ACO des opérations, dans leur ordre d'apparition
+    phases_df["aco"] = pd.Categorical(
+        phases_df["aco"], categories=list(dict.fromkeys(op.aco_responsable for op in operations))
+    )
+    return phases_df
+
+@st.cache_data(ttl=300)
+def cached_aco_alerts(version: int) -> pd.DataFrame:
+    """Retards et freins par ACO, pour tous les ACO ayant des opérations (ordre d'apparition)"""
+    # observed=False : les ACO sans phase gardent une ligne à zéro
+    return (
+        cached_phases_df(version)
+        .groupby("aco", observed=False)
+        .agg(retards=("is_retard", "sum"), freins=("n_freins", "sum"))
+    )
+
 # Session state pour la navigation
 if 'selected_operation_id' not in st.session_state:
     st.session_state.selected_operation_id = None
 if 'selected_aco' not in st.session_state:
     st.session_state.selected_aco = None
 
-def create_timeline_gantt(operation: Operation):
-    """Crée une timeline Gantt horizontale avec flèches colorées - SYNCHRONISÉE ET CORRIGÉE"""
-    if not operation.phases:
-        st.warning("Aucune phase définie pour cette opération")
-        return None
-    
-    fig = go.Figure()
-    traces_added = False
-    
-    # Créer les barres pour chaque phase
-    for i, phase in enumerate(operation.phases):
-        # Calculer la durée en jours
-        duration = (phase.date_fin - phase.date_debut).days + 1
-        
+# Couleurs des barres Gantt imposées par le statut (sinon couleur propre de la phase)
+STATUT_COULEURS = MappingProxyType({
+    "Terminé": "#28a745",
+    "En cours": "#007bff",
+    "Retard": "#dc3545"
+})
+
+def gantt_signature(operation: Operation) -> tuple:
+    """Empreinte hashable des phases d'une opération, utilisée comme clé de cache de la timeline"""
+    signature = []
+    for phase in operation.phases:
         # Convertir les attributs en strings si nécessaire
         nom_str = phase.nom[0] if isinstance(phase.nom, list) and phase.nom else str(phase.nom)
         statut_str = phase.statut[0] if isinstance(phase.statut, list) and phase.statut else str(phase.statut)
         responsable_str = phase.responsable[0] if isinstance(phase.responsable, list) and phase.responsable else str(phase.responsable)
         freins_list = phase.freins if hasattr(phase, 'freins') and isinstance(phase.freins, list) else []
         
+        signature.append((
+            phase.id, nom_str, phase.date_debut, phase.date_fin,
+            phase.couleur, statut_str, responsable_str, tuple(freins_list)
+        ))
+    return tuple(signature)
+
+def render_timeline_gantt(operation: Operation):
+    """Affiche la timeline Gantt horizontale avec flèches colorées - SYNCHRONISÉE ET CORRIGÉE"""
+    if not operation.phases:
+        st.warning("Aucune phase définie pour cette opération")
+        return
+    
+    fig = build_gantt_figure(operation.id, operation.nom, gantt_signature(operation))
+    st.plotly_chart(fig, use_container_width=True)
+
+@st.cache_data(ttl=300, max_entries=64)
+def build_gantt_figure(operation_id: str, operation_nom: str, phases_signature: tuple) -> go.Figure:
+    """Construit la figure Gantt, mémorisée tant que les phases de l'opération ne changent pas"""
+    import plotly.express as px  # import différé : chargé au premier graphique construit
+    
+    # Préparer les données de toutes les phases
+    rows = []
+    for phase_id, nom_str, date_debut, date_fin, couleur, statut_str, responsable_str, freins_list in phases_signature:
+        # Calculer la durée en jours
+        duration = (date_fin - date_debut).days + 1
+        
         # Couleur selon le statut
-        color = phase.couleur
-        if statut_str == "Terminé":
-            color = "#28a745"
-        elif statut_str == "En cours":
-            color = "#007bff"
-        elif statut_str == "Retard":
-            color = "#dc3545"
+        color = STATUT_COULEURS.get(statut_str, couleur)
         
         # Icône freins
         icon = " ⚠️" if freins_list else ""
         
-        # Ajouter la barre de la phase
-        fig.add_trace(go.Bar(
-            name=nom_str,
-            x=[duration],
-            y=[f"{nom_str}{icon}"],
-            orientation='h',
-            marker=dict(
-                color=color,
-                line=dict(color='white', width=2),
-                opacity=0.9
-            ),
-            base=phase.date_debut,
-            text=f"{format_duration(duration)}",
-            textposition="inside",
-            textfont=dict(color="white", size=10, family="Arial"),
-            hovertemplate=(
+        rows.append({
+            "Phase": f"{nom_str}{icon}",
+            "Start": date_debut,
+            "Finish": date_fin + timedelta(days=1),  # la date de fin est incluse
+            "Couleur": color,
+            "Durée": format_duration(duration),
+            "Survol": (
                 f"<b>{nom_str}</b><br>"
-                f"Début: {phase.date_debut.strftime('%d/%m/%Y')}<br>"
-                f"Fin: {phase.date_fin.strftime('%d/%m/%Y')}<br>"
+                f"Début: {date_debut.strftime('%d/%m/%Y')}<br>"
+                f"Fin: {date_fin.strftime('%d/%m/%Y')}<br>"
                 f"Durée: {format_duration(duration)}<br>"
                 f"Statut: {statut_str}<br>"
                 f"Responsable: {responsable_str}<br>"
-                f"Freins: {len(freins_list)}<br>"
-                "<extra></extra>"
+                f"Freins: {len(freins_list)}"
             )
+        })
+    df = pd.DataFrame(rows)
+    
+    # Une seule trace pour toutes les barres de phases
+    fig = px.timeline(df, x_start="Start", x_end="Finish", y="Phase", text="Durée")
+    fig.update_traces(
+        marker=dict(
+            color=df["Couleur"],
+            line=dict(color='white', width=2),
+            opacity=0.9
+        ),
+        textposition="inside",
+        textfont=dict(color="white", size=10, family="Arial"),
+        hovertext=df["Survol"],
+        hovertemplate="%{hovertext}<extra></extra>"
+    )
+    
+    # Flèches de liaison entre phases consécutives, regroupées dans une seule trace
+    # (les None séparent les segments)
+    arrow_x, arrow_y = [], []
+    for phase, next_phase in zip(rows, rows[1:]):
+        arrow_x += [phase["Finish"], next_phase["Start"], None]
+        arrow_y += [phase["Phase"], next_phase["Phase"], None]
+    
+    if arrow_x:
+        fig.add_trace(go.Scatter(
+            x=arrow_x,
+            y=arrow_y,
+            mode='lines',
+            line=dict(color='#666666', width=3),
+            hoverinfo='skip',
+            showlegend=False
         ))
-        traces_added = True
-        
-        # Ajouter une flèche si ce n'est pas la dernière phase
-        if i < len(operation.phases) - 1:
-            next_phase = operation.phases[i + 1]
-            
-            # Flèche de liaison
-            fig.add_annotation(
-                x=phase.date_fin,
-                y=i,
-                ax=next_phase.date_debut,
-                ay=i + 1,
-                arrowhead=2,
-                arrowsize=1.5,
-                arrowwidth=3,
-                arrowcolor="#666666"
-            )
     
     # Configuration du layout
     fig.update_layout(
         title={
-            'text': f"Timeline Interactive - {operation.nom}",
+            'text': f"Timeline Interactive - {operation_nom}",
             'x': 0.5,
             'xanchor': 'center',
             'font': {'size': 18, 'color': '#1f77b4'}
         },
         xaxis_title="Période",
         yaxis_title="Phases",
-        height=max(400, len(operation.phases) * 40),
+        height=max(400, len(phases_signature) * 40),
         showlegend=False,
         plot_bgcolor='rgba(248,249,250,0.8)',
         paper_bgcolor='rgba(255,255,255,1)',
@@ -629,19 +991,74 @@ def create_timeline_gantt(operation: Operation):
         font=dict(family="Arial", size=11)
     )
     
-    # Vérifier que des traces ont été ajoutées avant de retourner la figure
-    if not traces_added or len(fig.data) == 0:
-        st.warning("Aucune donnée valide pour créer la timeline")
-        return None
+    return fig
+
+@st.cache_data(ttl=300)
+def build_aco_performance_figure(version: int) -> go.Figure:
+    """Opérations en cours et budget par ACO dans une seule figure à deux graphiques"""
+    aco_list = construire_aco(version)
+    aco_names = [aco.nom for aco in aco_list]
+    operations_counts = [aco.operations_en_cours for aco in aco_list]
+    budgets = [aco.total_budget for aco in aco_list]
+    
+    fig = make_subplots(
+        rows=1, cols=2,
+        subplot_titles=("Opérations en cours par ACO", "Budget total géré par ACO")
+    )
+    fig.add_bar(
+        x=aco_names, y=operations_counts, row=1, col=1,
+        marker=dict(color=operations_counts, colorscale='Blues'),
+        hovertemplate="%{x}<br>Opérations : %{y}<extra></extra>"
+    )
+    fig.add_bar(
+        x=aco_names, y=budgets, row=1, col=2,
+        marker=dict(color=budgets, colorscale='Greens'),
+        hovertemplate="%{x}<br>Budget : %{y:,.0f} €<extra></extra>"
+    )
+    fig.update_xaxes(title_text="ACO")
+    fig.update_yaxes(title_text="Nombre d'opérations", row=1, col=1)
+    fig.update_yaxes(title_text="Budget (€)", row=1, col=2)
+    fig.update_layout(showlegend=False, height=450)
     
     return fig
 
+@st.cache_data(ttl=300)
+def build_alert_figures(df_alerts: pd.DataFrame) -> tuple:
+    """Graphiques des retards et des freins par ACO, mémorisés tant que les totaux ne changent pas"""
+    import plotly.express as px  # import différé : chargé au premier graphique construit
+    
+    fig_retards = px.bar(
+        df_alerts[['ACO', 'retards']], 
+        x='ACO', 
+        y='retards',
+        title="Retards par ACO",
+        color='retards',
+        color_continuous_scale='Reds'
+    )
+    fig_freins = px.bar(
+        df_alerts[['ACO', 'freins']], 
+        x='ACO', 
+        y='freins',
+        title="Freins par ACO",
+        color='freins',
+        color_continuous_scale='Oranges'
+    )
+    return fig_retards, fig_freins
+
 def dashboard():
     """Dashboard principal avec KPIs et vue d'ensemble - INTERACTIF ET CORRIGÉ"""
     st.markdown('<div class="main-header">🏗️ OPCOPILOT v3.0 - SPIC Guadeloupe</div>', unsafe_allow_html=True)
     
     db = get_database()
-    operations = db.load_operations()
+    version = db.version
+    # Table à plat des opérations (agrégats vectorisés) et tableau des plus récentes, mémorisés
+    df_ops, df = cached_dashboard_tables(version)
+    
+    # KPIs calculés en une seule requête SQL ; fenêtre de 30 jours arrondie au jour pour rester en cache
+    nb_operations, nouvelles_ops, nb_actives, budget_total, phases_en_retard, freins_critiques = cached_kpis(
+        version, datetime.combine(datetime.now().date() - timedelta(days=30), datetime.min.time())
+    )
+
     
     # Métriques principales
     col1, col2, col3, col4 = st.columns(4)
@@ -649,29 +1066,25 @@ def dashboard():
     with col1:
         st.metric(
             label="📊 Opérations Totales",
-            value=len(operations),
-            delta=f"+{len([op for op in operations if op.date_creation > datetime.now() - timedelta(days=30)])} ce mois"
+            value=nb_operations,
+            delta=f"+{nouvelles_ops} ce mois"
         )
     
     with col2:
-        operations_actives = [op for op in operations if op.statut in ["En cours", "Créée"]]
         st.metric(
             label="🔄 Opérations Actives",
-            value=len(operations_actives),
-            delta=f"{len(operations_actives)/len(operations)*100:.1f}%" if operations else "0%"
+            value=nb_actives,
+            delta=f"{nb_actives/nb_operations*100:.1f}%" if nb_operations else "0%"
         )
     
     with col3:
-        budget_total = sum(op.budget for op in operations)
         st.metric(
             label="💰 Budget Total",
             value=f"{budget_total:,.0f} €",
-            delta=f"{budget_total/len(operations):,.0f} € moy." if operations else "0 €"
+            delta=f"{budget_total/nb_operations:,.0f} € moy." if nb_operations else "0 €"
         )
     
     with col4:
-        phases_en_retard = sum(1 for op in operations for phase in op.phases if hasattr(phase, 'statut') and (phase.statut == "Retard" if isinstance(phase.statut, str) else (isinstance(phase.statut, list) and phase.statut and phase.statut[0] == "Retard")))
-        freins_critiques = sum(1 for op in operations for phase in op.phases if hasattr(phase, 'freins') and (isinstance(phase.freins, list) and phase.freins))
         st.metric(
             label="⚠️ Alertes Critiques",
             value=phases_en_retard + freins_critiques,
@@ -684,15 +1097,14 @@ def dashboard():
     
     with col1:
         st.subheader("📈 Répartition par Type d'Opération")
-        if operations:
-            type_counts = {}
-            for op in operations:
-                type_counts[op.type_operation] = type_counts.get(op.type_operation, 0) + 1
+        if not df_ops.empty:
+            import plotly.express as px  # import différé : chargé au premier graphique construit
+            type_counts = df_ops['type_operation'].value_counts()
             
-            if type_counts:  # Vérifier que nous avons des données
+            if not type_counts.empty:  # Vérifier que nous avons des données
                 fig_pie = px.pie(
-                    values=list(type_counts.values()),
-                    names=list(type_counts.keys()),
+                    values=type_counts.values,
+                    names=type_counts.index,
                     color_discrete_sequence=['#2ca02c', '#1f77b4', '#ff7f0e', '#d62728', '#9467bd']
                 )
                 fig_pie.update_layout(height=300)
@@ -708,18 +1120,15 @@ def dashboard():
     
     with col2:
         st.subheader("📊 KPIs par ACO")
-        if operations:
-            aco_stats = {}
-            for op in operations:
-                if op.aco_responsable not in aco_stats:
-                    aco_stats[op.aco_responsable] = {"total": 0, "actives": 0, "budget": 0}
-                aco_stats[op.aco_responsable]["total"] += 1
-                aco_stats[op.aco_responsable]["budget"] += op.budget
-                if op.statut in ["En cours", "Créée"]:
-                    aco_stats[op.aco_responsable]["actives"] += 1
+        if not df_ops.empty:
+            import plotly.express as px  # import différé : chargé au premier graphique construit
+            df_aco = (
+                df_ops.assign(actives=df_ops['statut'].isin(["En cours", "Créée"]).astype(int))
+                .groupby('aco_responsable')
+                .agg(total=('id', 'count'), actives=('actives', 'sum'), budget=('budget', 'sum'))
+            )
             
-            if aco_stats:  # Vérifier que nous avons des données
-                df_aco = pd.DataFrame.from_dict(aco_stats, orient='index')
+            if not df_aco.empty:  # Vérifier que nous avons des données
                 df_aco['ACO'] = df_aco.index
                 
                 fig_bar = px.bar(
@@ -743,45 +1152,13 @@ def dashboard():
     
     # ===== TABLEAU INTERACTIF AVEC LIENS CLIQUABLES =====
     st.subheader("📋 Opérations Récentes (Cliquables)")
-    if operations:
-        # Trier par date de création (plus récentes d'abord)
-        operations_sorted = sorted(operations, key=lambda x: x.date_creation, reverse=True)
-        
-        # Prendre les 10 plus récentes
-        recent_ops = operations_sorted[:10]
-        
-        # Créer le DataFrame pour l'affichage
-        data = []
-        for op in recent_ops:
-            phases_count = len(op.phases)
-            phases_completed = len([p for p in op.phases if hasattr(p, 'statut') and (p.statut == "Terminé" if isinstance(p.statut, str) else (isinstance(p.statut, list) and p.statut and p.statut[0] == "Terminé"))])
-            phases_retard = len([p for p in op.phases if hasattr(p, 'statut') and (p.statut == "Retard" if isinstance(p.statut, str) else (isinstance(p.statut, list) and p.statut and p.statut[0] == "Retard"))])
-            progress = f"{phases_completed}/{phases_count}" if phases_count > 0 else "0/0"
-            
-            # Indicateur de statut
-            status_indicator = "🟢" if phases_retard == 0 else "🔴"
-            if any(hasattr(p, 'freins') and isinstance(p.freins, list) and p.freins for p in op.phases):
-                status_indicator = "🟠"
-            
-            data.append({
-                "🎯": status_indicator,
-                "Nom": op.nom,
-                "Type": op.type_operation,
-                "ACO": op.aco_responsable,
-                "Statut": op.statut,
-                "Budget": f"{op.budget:,.0f} €",
-                "Progression": progress,
-                "Créée le": op.date_creation.strftime("%d/%m/%Y"),
-                "ID": op.id  # Caché pour sélection
-            })
-        
-        df = pd.DataFrame(data)
-        
+    if not df.empty:
         # Sélection d'opération avec callback
         event = st.dataframe(
-            df.drop('ID', axis=1), 
+            df, 
             use_container_width=True, 
             height=400,
+            hide_index=True,
             on_select="rerun",
             selection_mode="single-row"
         )
@@ -789,7 +1166,7 @@ def dashboard():
         # Navigation vers l'opération sélectionnée
         if event.selection and event.selection.rows:
             selected_idx = event.selection.rows[0]
-            selected_op_id = df.iloc[selected_idx]['ID']
+            selected_op_id = df.index[selected_idx]
             st.session_state.selected_operation_id = selected_op_id
             st.success(f"✅ Opération '{df.iloc[selected_idx]['Nom']}' sélectionnée. Allez dans 'Opérations en cours' pour voir les détails.")
     else:
@@ -798,37 +1175,28 @@ def dashboard():
     # Alertes et notifications avec actions
     st.subheader("🚨 Alertes & Notifications")
     
-    alerts = []
-    for op in operations:
-        for phase in op.phases:
-            statut_str = phase.statut[0] if isinstance(phase.statut, list) and phase.statut else str(phase.statut)
-            nom_str = phase.nom[0] if isinstance(phase.nom, list) and phase.nom else str(phase.nom)
-            freins_list = phase.freins if hasattr(phase, 'freins') and isinstance(phase.freins, list) else []
-            
-            if statut_str == "Retard":
-                alerts.append({
-                    "type": "retard",
-                    "message": f"⚠️ **{op.nom}** - Phase '{nom_str}' en retard",
-                    "operation_id": op.id
-                })
-            if freins_list:
-                alerts.append({
-                    "type": "frein",
-                    "message": f"🛑 **{op.nom}** - {len(freins_list)} frein(s) sur '{nom_str}'",
-                    "operation_id": op.id
-                })
+    # Afficher max 5 alertes, les retards en priorité
+    retard_phases, frein_phases = cached_phase_alerts(version)
+    alerts = [
+        ("retard", op_id, f"⚠️ **{op_nom}** - Phase '{phase_nom}' en retard")
+        for op_id, op_nom, phase_nom, nb_freins in retard_phases[:5]
+    ]
+    alerts += [
+        ("frein", op_id, f"🛑 **{op_nom}** - {nb_freins} frein(s) sur '{phase_nom}'")
+        for op_id, op_nom, phase_nom, nb_freins in frein_phases[:5 - len(alerts)]
+    ]
     
     if alerts:
-        for i, alert in enumerate(alerts[:5]):  # Afficher max 5 alertes
+        for i, (alert_type, operation_id, message) in enumerate(alerts):
             col_alert, col_action = st.columns([3, 1])
             with col_alert:
-                if alert["type"] == "retard":
-                    st.error(alert["message"])
+                if alert_type == "retard":
+                    st.error(message)
                 else:
-                    st.warning(alert["message"])
+                    st.warning(message)
             with col_action:
                 if st.button("Voir", key=f"alert_{i}"):
-                    st.session_state.selected_operation_id = alert["operation_id"]
+                    st.session_state.selected_operation_id = operation_id
                     st.info("Allez dans 'Opérations en cours' pour traiter l'alerte.")
     else:
         st.success("✅ Aucune alerte critique")
@@ -838,8 +1206,8 @@ def nouvelle_operation():
     st.header("➕ Nouvelle Opération")
     
     db = get_database()
-    aco_list = db.load_aco()
-    aco_names = [aco.nom for aco in aco_list]
+    version = db.version
+    aco_names = [aco_data[0] for aco_data in cached_aco_rows(version)[0]]
     
     with st.form("nouvelle_operation"):
         col1, col2 = st.columns(2)
@@ -863,14 +1231,12 @@ def nouvelle_operation():
         # Phases par défaut selon le type
         if type_operation in TEMPLATES_PHASES:
             template_phases = TEMPLATES_PHASES[type_operation]
-            duree_totale = sum(p["duree_jours"] for p in template_phases)
+            duree_totale = sum(p.duree_jours for p in template_phases)
             st.info(f"📋 Template **{type_operation}** : {len(template_phases)} phases - Durée totale : {format_duration(duree_totale)}")
             
             # Afficher les phases du template
             with st.expander(f"👁️ Voir les {len(template_phases)} phases du template {type_operation}"):
-                for i, phase_template in enumerate(template_phases):
-                    duration_formatted = format_duration(phase_template['duree_jours'])
-                    st.write(f"**{i+1}.** {phase_template['nom']} - *{duration_formatted}*")
+                st.markdown(rendu_template_phases(type_operation))
         
         # ===== OPTION PERSONNALISATION AVEC DURÉES MULTIPLES =====
         personnaliser = st.checkbox("🔧 Personnaliser les phases")
@@ -894,11 +1260,7 @@ def nouvelle_operation():
                     
                     if phase_nom:
                         duree_jours = convert_to_days(phase_duree, phase_unite)
-                        phases_personnalisees.append({
-                            "nom": phase_nom,
-                            "duree_jours": duree_jours,
-                            "couleur": phase_couleur
-                        })
+                        phases_personnalisees.append(PhaseTemplate(phase_nom, duree_jours, phase_couleur))
         
         submitted = st.form_submit_button("🚀 Créer l'Opération", type="primary")
         
@@ -912,26 +1274,25 @@ def nouvelle_operation():
                 st.error("La date de fin doit être postérieure à la date de début")
                 return
             
-            # Créer l'opération
-            operation_id = str(uuid.uuid4())
-            
             # Utiliser les phases personnalisées ou le template
             phases_template = phases_personnalisees if personnaliser and phases_personnalisees else TEMPLATES_PHASES[type_operation]
             
+            # Identifiants de l'opération et de ses phases en un seul tirage
+            operation_id, *phase_ids = generer_ids(1 + len(phases_template))
+            
             # Créer les phases
             phases = []
             current_date = datetime.combine(date_debut, datetime.min.time())
             
-            for phase_template in phases_template:
-                phase_id = str(uuid.uuid4())
-                date_fin_phase = current_date + timedelta(days=phase_template["duree_jours"] - 1)
+            for phase_id, phase_template in zip(phase_ids, phases_template):
+                date_fin_phase = current_date + timedelta(days=phase_template.duree_jours - 1)
                 
                 phase = Phase(
                     id=phase_id,
-                    nom=phase_template["nom"],
+                    nom=phase_template.nom,
                     date_debut=current_date,
                     date_fin=date_fin_phase,
-                    couleur=phase_template["couleur"],
+                    couleur=phase_template.couleur,
                     statut="En attente",
                     responsable=aco_responsable
                 )
@@ -955,18 +1316,16 @@ def nouvelle_operation():
             # Sauvegarder
             db.save_operation(operation)
             
+            # Préparer la timeline à l'écriture : le premier affichage est servi par le cache
+            if operation.phases:
+                build_gantt_figure(operation.id, operation.nom, gantt_signature(operation))
+            
             # Mettre à jour sélection
             st.session_state.selected_operation_id = operation_id
             
             st.success(f"✅ Opération '{nom}' créée avec succès avec {len(phases)} phases !")
             st.balloons()
             
-            # Afficher un aperçu de la timeline
-            st.subheader("📊 Aperçu de la Timeline")
-            fig = create_timeline_gantt(operation)
-            if fig:
-                st.plotly_chart(fig, use_container_width=True)
-            
             # SYNCHRONISATION FORCÉE
             st.rerun()
 
@@ -975,22 +1334,18 @@ def operations_en_cours():
     st.header("📊 Opérations en cours")  # NAVIGATION COHÉRENTE
     
     db = get_database()
-    operations = db.load_operations()
+    version = db.version
+    # Libellés et index mémorisés ; seule l'opération sélectionnée est construite
+    operation_names, display_to_id, id_to_index = cached_operation_index(version)
     
-    if not operations:
+    if not operation_names:
         st.warning("Aucune opération trouvée. Créez d'abord une opération.")
         return
     
     # Sélection de l'opération avec pré-sélection
-    operation_names = [f"{op.nom} ({op.type_operation})" for op in operations]
     
     # Trouver l'index de l'opération pré-sélectionnée
-    default_index = 0
-    if st.session_state.selected_operation_id:
-        for i, op in enumerate(operations):
-            if op.id == st.session_state.selected_operation_id:
-                default_index = i
-                break
+    default_index = id_to_index.get(st.session_state.selected_operation_id, 0)
     
     selected_name = st.selectbox(
         "Sélectionner une opération", 
@@ -1002,13 +1357,12 @@ def operations_en_cours():
     if selected_name:
         # Trouver l'opération sélectionnée
         selected_operation = None
-        for op in operations:
-            if f"{op.nom} ({op.type_operation})" == selected_name:
-                selected_operation = op
-                st.session_state.selected_operation_id = op.id
-                break
+        if selected_name in display_to_id:
+            selected_operation = construire_operation(version, display_to_id[selected_name])
         
         if selected_operation:
+            st.session_state.selected_operation_id = selected_operation.id
+            
             # S'assurer que phases est une liste valide
             if not isinstance(selected_operation.phases, list):
                 selected_operation.phases = []
@@ -1022,15 +1376,13 @@ def operations_en_cours():
             with col3:
                 st.metric("Budget", f"{selected_operation.budget:,.0f} €")
             with col4:
-                phases_completed = len([p for p in selected_operation.phases if hasattr(p, 'statut') and (p.statut == "Terminé" if isinstance(p.statut, str) else (isinstance(p.statut, list) and p.statut and p.statut[0] == "Terminé"))])
+                phases_completed, _, _ = compter_phases(selected_operation)
                 progress_pct = (phases_completed / len(selected_operation.phases) * 100) if selected_operation.phases else 0
                 st.metric("Avancement", f"{progress_pct:.1f}%", f"{phases_completed}/{len(selected_operation.phases)} phases")
             
             # Timeline Gantt synchronisée
             st.subheader("🎯 Timeline Interactive")
-            fig = create_timeline_gantt(selected_operation)
-            if fig:
-                st.plotly_chart(fig, use_container_width=True)
+            render_timeline_gantt(selected_operation)
             
             # Gestion des phases
             st.subheader("⚙️ Gestion des Phases")
@@ -1070,19 +1422,19 @@ def operations_en_cours():
                         with col_act1:
                             if st.button(f"✅ Terminer", key=f"complete_{phase.id}"):
                                 phase.statut = "Terminé"
-                                db.save_operation(selected_operation)
+                                db.save_phase(selected_operation.id, phase)
                                 st.success("Phase marquée comme terminée !")
                                 st.rerun()  # SYNCHRONISATION
                         with col_act2:
                             if st.button(f"🚀 Démarrer", key=f"start_{phase.id}"):
                                 phase.statut = "En cours"
-                                db.save_operation(selected_operation)
+                                db.save_phase(selected_operation.id, phase)
                                 st.success("Phase marquée en cours !")
                                 st.rerun()  # SYNCHRONISATION
                         with col_act3:
                             if st.button(f"⚠️ Retard", key=f"delay_{phase.id}"):
                                 phase.statut = "Retard"
-                                db.save_operation(selected_operation)
+                                db.save_phase(selected_operation.id, phase)
                                 st.warning("Phase marquée en retard !")
                                 st.rerun()  # SYNCHRONISATION
             
@@ -1102,12 +1454,12 @@ def operations_en_cours():
                     
                     new_phase_description = st.text_area("Description (optionnel)")
                     
-                    # Position d'insertion
-                    positions = ["À la fin"]
-                    for phase in selected_operation.phases:
+                    # Position d'insertion : (libellé, index d'insertion, None pour la fin)
+                    positions = [("À la fin", None)]
+                    for idx, phase in enumerate(selected_operation.phases):
                         nom_str = phase.nom[0] if isinstance(phase.nom, list) and phase.nom else str(phase.nom)
-                        positions.append(f"Avant '{nom_str}'")
-                    position = st.selectbox("Insérer", positions)
+                        positions.append((f"Avant '{nom_str}'", idx))
+                    _, insert_idx = st.selectbox("Insérer", positions, format_func=lambda position: position[0])
                     
                     if st.form_submit_button("Ajouter la Phase"):
                         if new_phase_nom:
@@ -1115,16 +1467,16 @@ def operations_en_cours():
                             new_phase_duree = convert_to_days(new_duree, new_unite)
                             
                             # Calculer les dates
-                            if position == "À la fin" and selected_operation.phases:
+                            if insert_idx is None and selected_operation.phases:
                                 date_debut = selected_operation.phases[-1].date_fin + timedelta(days=1)
-                            elif position != "À la fin":
-                                # Trouver la position d'insertion
-                                idx = positions.index(position) - 1
-                                date_debut = selected_operation.phases[idx].date_debut
-                                # Décaler les phases suivantes
-                                for phase in selected_operation.phases[idx:]:
-                                    phase.date_debut += timedelta(days=new_phase_duree)
-                                    phase.date_fin += timedelta(days=new_phase_duree)
+                            elif insert_idx is not None:
+                                date_debut = selected_operation.phases[insert_idx].date_debut
+                                # Décaler les phases suivantes (décalage calculé une seule fois)
+                                decalage = timedelta(days=new_phase_duree)
+                                for i in range(insert_idx, len(selected_operation.phases)):
+                                    phase = selected_operation.phases[i]
+                                    phase.date_debut += decalage
+                                    phase.date_fin += decalage
                             else:
                                 date_debut = selected_operation.date_debut
                             
@@ -1143,11 +1495,10 @@ def operations_en_cours():
                             )
                             
                             # Insérer dans la liste
-                            if position == "À la fin":
+                            if insert_idx is None:
                                 selected_operation.phases.append(new_phase)
                             else:
-                                idx = positions.index(position) - 1
-                                selected_operation.phases.insert(idx, new_phase)
+                                selected_operation.phases.insert(insert_idx, new_phase)
                             
                             # Sauvegarder avec SYNCHRONISATION
                             db.save_operation(selected_operation)
@@ -1176,7 +1527,9 @@ def operations_en_cours():
                                 break
                         
                         if selected_phase:
-                            with st.form("modify_phase"):
+                            # Champs remis à zéro après soumission : « Lever tous les freins » et les
+                            # freins additionnels ne s'appliquent pas de nouveau à la soumission suivante
+                            with st.form("modify_phase", clear_on_submit=True):
                                 # Convertir les valeurs en strings pour le formulaire
                                 current_statut = selected_phase.statut[0] if isinstance(selected_phase.statut, list) and selected_phase.statut else str(selected_phase.statut)
                                 current_responsable = selected_phase.responsable[0] if isinstance(selected_phase.responsable, list) and selected_phase.responsable else str(selected_phase.responsable)
@@ -1197,17 +1550,6 @@ def operations_en_cours():
                                 mod_description = st.text_area("Description", value=current_description if current_description != 'None' else "")
                                 
                                 # ===== GESTION FREINS OPÉRATIONNELLE =====
-                                st.write("**Freins identifiés :**")
-                                
-                                # Afficher les freins existants
-                                if current_freins:
-                                    for frein in current_freins:
-                                        frein_str = frein[0] if isinstance(frein, list) and frein else str(frein)
-                                        st.error(f"• {frein_str}")
-                                
-                                # Ajouter nouveau frein
-                                nouveau_frein = st.text_input("Ajouter un frein")
-                                
                                 # Freins prédéfinis
                                 freins_predefinies = [
                                     "Retard fournisseur",
@@ -1218,14 +1560,21 @@ def operations_en_cours():
                                     "Manque de ressources",
                                     "Dépendance externe"
                                 ]
-                                frein_predefini = st.selectbox("Ou sélectionner un frein prédéfini", [""] + freins_predefinies)
+                                freins_actuels = list(dict.fromkeys(
+                                    frein[0] if isinstance(frein, list) and frein else str(frein)
+                                    for frein in current_freins
+                                ))
                                 
-                                # Actions freins
-                                col_clear, col_add = st.columns(2)
-                                with col_clear:
-                                    clear_freins = st.checkbox("Lever tous les freins")
-                                with col_add:
-                                    add_frein = nouveau_frein or frein_predefini
+                                # Freins conservés, retirés ou ajoutés : appliqués à la soumission du formulaire.
+                                # La clé dépend des freins enregistrés : le widget repart de `default` dès qu'ils changent
+                                freins_selectionnes = st.multiselect(
+                                    "Freins identifiés",
+                                    options=list(dict.fromkeys(freins_actuels + freins_predefinies)),
+                                    default=freins_actuels,
+                                    key=f"freins_{selected_phase.id}_{hash(tuple(freins_actuels))}"
+                                )
+                                freins_additionnels = st.text_area("Freins additionnels (un par ligne)")
+                                clear_freins = st.checkbox("Lever tous les freins")
                                 
                                 if st.form_submit_button("💾 Modifier la Phase"):
                                     # Mettre à jour la phase
@@ -1237,14 +1586,13 @@ def operations_en_cours():
                                     
                                     # Gestion des freins
                                     if clear_freins:
-                                        selected_phase.freins = []
-                                    elif add_frein and add_frein not in current_freins:
-                                        updated_freins = current_freins.copy()
-                                        updated_freins.append(add_frein)
-                                        selected_phase.freins = updated_freins
+                                        selected_phase.freins.clear()
+                                    else:
+                                        nouveaux_freins = [f.strip() for f in freins_additionnels.splitlines() if f.strip()]
+                                        selected_phase.freins = list(dict.fromkeys(freins_selectionnes + nouveaux_freins))
                                     
                                     # Sauvegarder avec SYNCHRONISATION
-                                    db.save_operation(selected_operation)
+                                    db.save_phase(selected_operation.id, selected_phase)
                                     st.success("Phase modifiée avec succès !")
                                     st.rerun()  # SYNCHRONISATION TIMELINE
 
@@ -1254,8 +1602,8 @@ def gestion_aco():
     st.header("👥 Gestion ACO")
     
     db = get_database()
-    aco_list = db.load_aco()
-    operations = db.load_operations()
+    version = db.version
+    aco_list = construire_aco(version)
     
     tabs = st.tabs(["📋 Liste des ACO", "📊 Performances", "👤 Détail ACO"])
     
@@ -1297,80 +1645,41 @@ def gestion_aco():
         st.subheader("📊 Tableau de Bord des Performances")
         
         if aco_list:
-            # Graphique des opérations par ACO
-            aco_names = [aco.nom for aco in aco_list]
-            operations_counts = [aco.operations_en_cours for aco in aco_list]
-            budgets = [aco.total_budget for aco in aco_list]
-            
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                if any(count > 0 for count in operations_counts):  # Vérifier qu'il y a des données
-                    fig_ops = px.bar(
-                        x=aco_names, 
-                        y=operations_counts,
-                        title="Opérations en cours par ACO",
-                        labels={'x': 'ACO', 'y': 'Nombre d\'opérations'},
-                        color=operations_counts,
-                        color_continuous_scale='Blues'
-                    )
-                    # Vérifier que la figure a des données avant affichage
-                    if len(fig_ops.data) > 0:
-                        st.plotly_chart(fig_ops, use_container_width=True)
-                    else:
-                        st.info("Aucune donnée d'opérations à afficher")
-                else:
-                    st.info("Aucune opération en cours")
+            # Graphiques des opérations et budgets par ACO (une seule figure mémorisée)
+            has_operations = any(aco.operations_en_cours > 0 for aco in aco_list)
+            has_budget = any(aco.total_budget > 0 for aco in aco_list)
             
-            with col2:
-                if any(budget > 0 for budget in budgets):  # Vérifier qu'il y a des données
-                    fig_budget = px.bar(
-                        x=aco_names, 
-                        y=budgets,
-                        title="Budget total géré par ACO",
-                        labels={'x': 'ACO', 'y': 'Budget (€)'},
-                        color=budgets,
-                        color_continuous_scale='Greens'
-                    )
-                    # Vérifier que la figure a des données avant affichage
-                    if len(fig_budget.data) > 0:
-                        st.plotly_chart(fig_budget, use_container_width=True)
-                    else:
-                        st.info("Aucune donnée de budget à afficher")
-                else:
-                    st.info("Aucun budget défini")
+            if has_operations or has_budget:
+                st.plotly_chart(build_aco_performance_figure(version), use_container_width=True)
+            if not has_operations:
+                st.info("Aucune opération en cours")
+            if not has_budget:
+                st.info("Aucun budget défini")
             
             # Statistiques détaillées
             st.subheader("📈 Analyse des Performances")
             
+            aco_stats = cached_aco_stats(version)
             for aco in aco_list:
-                aco_operations = [op for op in operations if op.aco_responsable == aco.nom]
+                stats = aco_stats.get(aco.nom)
                 
-                if aco_operations:
-                    # Calculer les métriques
-                    phases_retard = sum(1 for op in aco_operations for phase in op.phases if hasattr(phase, 'statut') and (phase.statut == "Retard" if isinstance(phase.statut, str) else (isinstance(phase.statut, list) and phase.statut and phase.statut[0] == "Retard")))
-                    phases_freins = sum(1 for op in aco_operations for phase in op.phases if hasattr(phase, 'freins') and isinstance(phase.freins, list) and phase.freins)
-                    budget_moyen = aco.total_budget / len(aco_operations) if aco_operations else 0
-                    
+                if stats:
                     with st.expander(f"📊 Détail {aco.nom}"):
                         col1, col2, col3, col4 = st.columns(4)
                         with col1:
-                            st.metric("Opérations totales", len(aco_operations))
+                            st.metric("Opérations totales", stats["ops"])
                         with col2:
-                            st.metric("Phases en retard", phases_retard)
+                            st.metric("Phases en retard", stats["retard"])
                         with col3:
-                            st.metric("Phases avec freins", phases_freins)
+                            st.metric("Phases avec freins", stats["freins"])
                         with col4:
-                            st.metric("Budget moyen", f"{budget_moyen:,.0f} €")
+                            st.metric("Budget moyen", f"{stats['budget_moyen']:,.0f} €")
     
     with tabs[2]:
         # Détail ACO sélectionné avec WORKFLOW
         if st.session_state.selected_aco:
-            selected_aco_obj = None
-            for aco in aco_list:
-                if aco.nom == st.session_state.selected_aco:
-                    selected_aco_obj = aco
-                    break
+            aco_by_nom = {aco.nom: aco for aco in aco_list}
+            selected_aco_obj = aco_by_nom.get(st.session_state.selected_aco)
             
             if selected_aco_obj:
                 st.subheader(f"👤 Détail {selected_aco_obj.nom}")
@@ -1384,37 +1693,12 @@ def gestion_aco():
                     st.write(f"**Spécialités :** {' | '.join(selected_aco_obj.specialites)}")
                 
                 # Opérations de cet ACO
-                aco_operations = [op for op in operations if op.aco_responsable == selected_aco_obj.nom]
+                df, aco_operations = cached_aco_operations_df(version, selected_aco_obj.nom)
                 
                 if aco_operations:
                     st.subheader(f"📋 Opérations de {selected_aco_obj.nom} ({len(aco_operations)})")
                     
                     # Tableau des opérations avec NAVIGATION
-                    data = []
-                    for op in aco_operations:
-                        phases_completed = len([p for p in op.phases if hasattr(p, 'statut') and (p.statut == "Terminé" if isinstance(p.statut, str) else (isinstance(p.statut, list) and p.statut and p.statut[0] == "Terminé"))])
-                        phases_retard = len([p for p in op.phases if hasattr(p, 'statut') and (p.statut == "Retard" if isinstance(p.statut, str) else (isinstance(p.statut, list) and p.statut and p.statut[0] == "Retard"))])
-                        phases_freins = sum(1 for p in op.phases if hasattr(p, 'freins') and isinstance(p.freins, list) and p.freins)
-                        
-                        status_indicator = "🟢"
-                        if phases_retard > 0:
-                            status_indicator = "🔴"
-                        elif phases_freins > 0:
-                            status_indicator = "🟠"
-                        
-                        data.append({
-                            "🎯": status_indicator,
-                            "Nom": op.nom,
-                            "Type": op.type_operation,
-                            "Statut": op.statut,
-                            "Budget": f"{op.budget:,.0f} €",
-                            "Progression": f"{phases_completed}/{len(op.phases)}",
-                            "Retards": phases_retard,
-                            "Freins": phases_freins,
-                            "Créée": op.date_creation.strftime("%d/%m/%Y")
-                        })
-                    
-                    df = pd.DataFrame(data)
                     
                     # Sélection d'opération avec navigation
                     event = st.dataframe(
@@ -1427,202 +1711,182 @@ def gestion_aco():
                     # Navigation vers l'opération sélectionnée
                     if event.selection and event.selection.rows:
                         selected_idx = event.selection.rows[0]
-                        selected_op = aco_operations[selected_idx]
-                        st.session_state.selected_operation_id = selected_op.id
-                        st.success(f"✅ Opération '{selected_op.nom}' sélectionnée. Allez dans 'Opérations en cours' pour voir les détails.")
+                        selected_op_id, selected_op_nom = aco_operations[selected_idx]
+                        st.session_state.selected_operation_id = selected_op_id
+                        st.success(f"✅ Opération '{selected_op_nom}' sélectionnée. Allez dans 'Opérations en cours' pour voir les détails.")
                 else:
                     st.info(f"Aucune opération assignée à {selected_aco_obj.nom}")
         else:
             st.info("Sélectionnez un ACO dans l'onglet 'Liste des ACO' pour voir les détails.")
 
+# Cartes d'alerte HTML, remplies par format_map avec une ligne de cached_phases_df
+CARTE_RETARD_HTML = (
+    '<div class="frein-critical">'
+    '<h5>⚠️ {op_nom} - {phase_nom}</h5>'
+    '<p><strong>ACO:</strong> {aco} | <strong>Type:</strong> {type_operation}</p>'
+    '<p><strong>Période:</strong> {date_debut:%d/%m/%Y} → {date_fin:%d/%m/%Y}</p>'
+    '</div>'
+)
+CARTE_FREIN_HTML = (
+    '<div class="frein-alert">'
+    '<h5>🛑 {op_nom} - {phase_nom}</h5>'
+    '<p><strong>ACO:</strong> {aco} | <strong>Gravité:</strong> {gravite}</p>'
+    '<p><strong>Freins ({n_freins}):</strong> {freins}</p>'
+    '</div>'
+)
+
+@st.fragment
+def onglet_retards(db: DatabaseManager, retards_df: pd.DataFrame):
+    """Onglet des phases en retard, rejoué seul quand une action n'a pas besoin de recharger la page"""
+    # Gestion des retards
+    st.subheader("🔴 Phases en Retard")
+    
+    if not retards_df.empty:
+        # Toutes les cartes en un seul bloc HTML
+        st.markdown("\n".join(
+            CARTE_RETARD_HTML.format_map(row) for row in retards_df.to_dict("records")
+        ), unsafe_allow_html=True)
+        
+        # Actions : une ligne compacte par phase en retard (phase construite seulement au clic)
+        for op_id, op_nom, phase_id, phase_nom in retards_df[["op_id", "op_nom", "phase_id", "phase_nom"]].itertuples(index=False):
+            col_nom, col1, col2, col3 = st.columns([2, 1, 1, 1])
+            with col_nom:
+                st.write(f"**{op_nom}** - {phase_nom}")
+            with col1:
+                if st.button(f"✅ Résolu", key=f"resolve_retard_{phase_id}"):
+                    op, phase = construire_phase(db.version, op_id, phase_id)
+                    if phase:
+                        phase.statut = "En cours"
+                        db.save_phase(op.id, phase)
+                    st.success("Retard résolu !")
+                    st.rerun()
+            with col2:
+                if st.button(f"📅 Reprogrammer", key=f"reschedule_{phase_id}"):
+                    op, phase = construire_phase(db.version, op_id, phase_id)
+                    if phase:
+                        # Ajouter 7 jours à la date de fin
+                        phase.date_fin += timedelta(days=7)
+                        db.save_phase(op.id, phase)
+                    st.info("Phase reprogrammée (+7 jours)")
+                    st.rerun()
+            with col3:
+                if st.button(f"👁️ Voir Détail", key=f"view_retard_{phase_id}"):
+                    st.session_state.selected_operation_id = op_id
+                    st.info("Allez dans 'Opérations en cours' pour plus de détails.")
+    else:
+        st.success("✅ Aucune phase en retard !")
+
+@st.fragment
+def onglet_freins(db: DatabaseManager, freins_df: pd.DataFrame):
+    """Onglet des freins identifiés, rejoué seul quand une action n'a pas besoin de recharger la page"""
+    # Gestion des freins
+    st.subheader("🟠 Freins Identifiés")
+    
+    if not freins_df.empty:
+        # Toutes les cartes en un seul bloc HTML
+        st.markdown("\n".join(
+            CARTE_FREIN_HTML.format_map(row) for row in freins_df.to_dict("records")
+        ), unsafe_allow_html=True)
+        
+        # Actions : une ligne compacte par phase avec freins (phase construite seulement au clic)
+        for op_id, op_nom, phase_id, phase_nom in freins_df[["op_id", "op_nom", "phase_id", "phase_nom"]].itertuples(index=False):
+            col_nom, col1, col2, col3 = st.columns([2, 1, 1, 1])
+            with col_nom:
+                st.write(f"**{op_nom}** - {phase_nom}")
+            with col1:
+                if st.button(f"✅ Lever Freins", key=f"resolve_frein_{phase_id}"):
+                    op, phase = construire_phase(db.version, op_id, phase_id)
+                    if phase:
+                        phase.freins.clear()
+                        db.save_phase(op.id, phase)
+                    st.success("Freins levés !")
+                    st.rerun()
+            with col2:
+                # Formulaire rapide d'ajout, ouvert à la demande (état conservé entre les reruns)
+                toggle_key = f"add_frein_open_{phase_id}"
+                if st.button("➕ Ajouter Frein", key=f"add_frein_btn_{phase_id}"):
+                    st.session_state[toggle_key] = not st.session_state.get(toggle_key, False)
+                if st.session_state.get(toggle_key):
+                    with st.form(f"add_frein_form_{phase_id}"):
+                        new_frein = st.text_input("Nouveau frein", key=f"new_frein_{phase_id}")
+                        if st.form_submit_button("➕"):
+                            if new_frein:
+                                op, phase = construire_phase(db.version, op_id, phase_id)
+                                if phase:
+                                    phase.freins.append(new_frein)
+                                    db.save_phase(op.id, phase)
+                                st.session_state[toggle_key] = False
+                                st.success("Frein ajouté !")
+                                st.rerun()
+            with col3:
+                if st.button(f"👁️ Voir Détail", key=f"view_frein_{phase_id}"):
+                    st.session_state.selected_operation_id = op_id
+                    st.info("Allez dans 'Opérations en cours' pour plus de détails.")
+    else:
+        st.success("✅ Aucun frein identifié !")
+
 def freins_alertes():
     """Module de gestion des freins et alertes - MAINTENANT ACTIF ET CORRIGÉ"""
     st.header("🚨 Freins & Alertes")
     
     db = get_database()
-    operations = db.load_operations()
+    version = db.version
     
-    # Collecter toutes les alertes
-    alertes_retard = []
-    alertes_freins = []
+    if not cached_operation_labels(version):
+        st.warning("Aucune opération trouvée. Créez d'abord une opération.")
+        return
+    
+    # Calculs sur la table à plat des phases ; les objets ne sont construits que pour les actions
+    phases_df = cached_phases_df(version)
+    retards_df = phases_df[phases_df["is_retard"]]
+    freins_df = phases_df[phases_df["n_freins"] > 0]
+    
+    # Métriques d'alerte, calculées une fois
+    nb_retards = len(retards_df)
+    nb_phases_freins = len(freins_df)
+    total_freins = int(phases_df["n_freins"].sum())
+    alertes_critiques = nb_retards + int((freins_df["n_freins"] > 2).sum())
     
-    for op in operations:
-        for phase in op.phases:
-            statut_str = phase.statut[0] if isinstance(phase.statut, list) and phase.statut else str(phase.statut)
-            freins_list = phase.freins if hasattr(phase, 'freins') and isinstance(phase.freins, list) else []
-            
-            if statut_str == "Retard":
-                alertes_retard.append({
-                    "operation": op,
-                    "phase": phase,
-                    "gravite": "Critique"
-                })
-            if freins_list:
-                alertes_freins.append({
-                    "operation": op,
-                    "phase": phase,
-                    "freins": freins_list,
-                    "gravite": "Élevée" if len(freins_list) > 2 else "Modérée"
-                })
-    
-    # Métriques d'alerte
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        st.metric("🔴 Phases en Retard", len(alertes_retard))
+        st.metric("🔴 Phases en Retard", nb_retards)
     with col2:
-        st.metric("🟠 Phases avec Freins", len(alertes_freins))
+        st.metric("🟠 Phases avec Freins", nb_phases_freins)
     with col3:
-        total_freins = sum(len(alert["freins"]) for alert in alertes_freins)
         st.metric("📊 Total Freins", total_freins)
     with col4:
-        alertes_critiques = len([a for a in alertes_retard]) + len([a for a in alertes_freins if a["gravite"] == "Élevée"])
         st.metric("⚠️ Alertes Critiques", alertes_critiques)
     
     tabs = st.tabs(["🔴 Retards", "🟠 Freins", "📊 Tableau de Bord"])
     
     with tabs[0]:
-        # Gestion des retards
-        st.subheader("🔴 Phases en Retard")
-        
-        if alertes_retard:
-            for i, alerte in enumerate(alertes_retard):
-                op = alerte["operation"]
-                phase = alerte["phase"]
-                nom_str = phase.nom[0] if isinstance(phase.nom, list) and phase.nom else str(phase.nom)
-                
-                st.markdown(f"""
-                <div class="frein-critical">
-                    <h5>⚠️ {op.nom} - {nom_str}</h5>
-                    <p><strong>ACO:</strong> {op.aco_responsable} | <strong>Type:</strong> {op.type_operation}</p>
-                    <p><strong>Période:</strong> {phase.date_debut.strftime('%d/%m/%Y')} → {phase.date_fin.strftime('%d/%m/%Y')}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    if st.button(f"✅ Résolu", key=f"resolve_retard_{i}"):
-                        phase.statut = "En cours"
-                        db.save_operation(op)
-                        st.success("Retard résolu !")
-                        st.rerun()
-                with col2:
-                    if st.button(f"📅 Reprogrammer", key=f"reschedule_{i}"):
-                        # Ajouter 7 jours à la date de fin
-                        phase.date_fin += timedelta(days=7)
-                        db.save_operation(op)
-                        st.info("Phase reprogrammée (+7 jours)")
-                        st.rerun()
-                with col3:
-                    if st.button(f"👁️ Voir Détail", key=f"view_retard_{i}"):
-                        st.session_state.selected_operation_id = op.id
-                        st.info("Allez dans 'Opérations en cours' pour plus de détails.")
-        else:
-            st.success("✅ Aucune phase en retard !")
+        onglet_retards(db, retards_df)
     
     with tabs[1]:
-        # Gestion des freins
-        st.subheader("🟠 Freins Identifiés")
-        
-        if alertes_freins:
-            for i, alerte in enumerate(alertes_freins):
-                op = alerte["operation"]
-                phase = alerte["phase"]
-                freins = alerte["freins"]
-                nom_str = phase.nom[0] if isinstance(phase.nom, list) and phase.nom else str(phase.nom)
-                freins_display = ', '.join(freins) if isinstance(freins, list) else str(freins)
-                
-                st.markdown(f"""
-                <div class="frein-alert">
-                    <h5>🛑 {op.nom} - {nom_str}</h5>
-                    <p><strong>ACO:</strong> {op.aco_responsable} | <strong>Gravité:</strong> {alerte['gravite']}</p>
-                    <p><strong>Freins ({len(freins)}):</strong> {freins_display}</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                col1, col2, col3 = st.columns(3)
-                with col1:
-                    if st.button(f"✅ Lever Freins", key=f"resolve_frein_{i}"):
-                        phase.freins = []
-                        db.save_operation(op)
-                        st.success("Freins levés !")
-                        st.rerun()
-                with col2:
-                    # Ajouter frein avec formulaire rapide
-                    with st.form(f"add_frein_form_{i}"):
-                        new_frein = st.text_input("Nouveau frein", key=f"new_frein_{i}")
-                        if st.form_submit_button("➕"):
-                            if new_frein:
-                                phase.freins.append(new_frein)
-                                db.save_operation(op)
-                                st.success("Frein ajouté !")
-                                st.rerun()
-                with col3:
-                    if st.button(f"👁️ Voir Détail", key=f"view_frein_{i}"):
-                        st.session_state.selected_operation_id = op.id
-                        st.info("Allez dans 'Opérations en cours' pour plus de détails.")
-        else:
-            st.success("✅ Aucun frein identifié !")
+        onglet_freins(db, freins_df)
     
     with tabs[2]:
         # Tableau de bord des alertes CORRIGÉ
         st.subheader("📊 Tableau de Bord des Alertes")
         
-        # Graphique des alertes par ACO
-        aco_alerts = {}
-        for op in operations:
-            aco = op.aco_responsable
-            if aco not in aco_alerts:
-                aco_alerts[aco] = {"retards": 0, "freins": 0}
-            
-            for phase in op.phases:
-                statut_str = phase.statut[0] if isinstance(phase.statut, list) and phase.statut else str(phase.statut)
-                freins_list = phase.freins if hasattr(phase, 'freins') and isinstance(phase.freins, list) else []
-                
-                if statut_str == "Retard":
-                    aco_alerts[aco]["retards"] += 1
-                if freins_list:
-                    aco_alerts[aco]["freins"] += len(freins_list)
-        
-        if aco_alerts:
-            df_alerts = pd.DataFrame.from_dict(aco_alerts, orient='index')
+        # Graphique des alertes par ACO (rien à agréger ni tracer sans alerte)
+        if nb_retards or nb_phases_freins:
+            df_alerts = cached_aco_alerts(version)
             df_alerts['ACO'] = df_alerts.index
-            df_alerts['Total_Alertes'] = df_alerts['retards'] + df_alerts['freins']
+            
+            fig_retards, fig_freins = build_alert_figures(df_alerts)
             
             col1, col2 = st.columns(2)
             
             with col1:
                 if any(df_alerts['retards'] > 0):  # Vérifier qu'il y a des données
-                    fig_retards = px.bar(
-                        df_alerts, 
-                        x='ACO', 
-                        y='retards',
-                        title="Retards par ACO",
-                        color='retards',
-                        color_continuous_scale='Reds'
-                    )
-                    # Vérifier que la figure a des données avant affichage
-                    if len(fig_retards.data) > 0:
-                        st.plotly_chart(fig_retards, use_container_width=True)
-                    else:
-                        st.info("Aucune donnée de retards à afficher")
+                    st.plotly_chart(fig_retards, use_container_width=True)
                 else:
                     st.info("Aucun retard identifié")
             
             with col2:
                 if any(df_alerts['freins'] > 0):  # Vérifier qu'il y a des données
-                    fig_freins = px.bar(
-                        df_alerts, 
-                        x='ACO', 
-                        y='freins',
-                        title="Freins par ACO",
-                        color='freins',
-                        color_continuous_scale='Oranges'
-                    )
-                    # Vérifier que la figure a des données avant affichage
-                    if len(fig_freins.data) > 0:
-                        st.plotly_chart(fig_freins, use_container_width=True)
-                    else:
-                        st.info("Aucune donnée de freins à afficher")
+                    st.plotly_chart(fig_freins, use_container_width=True)
                 else:
                     st.info("Aucun frein identifié")
         else:
@@ -1682,16 +1946,11 @@ def main():
     if st.session_state.selected_operation_id:
         st.sidebar.markdown("---")
         st.sidebar.markdown("### 🎯 Opération Sélectionnée")
-        db = get_database()
-        operations = db.load_operations()
-        selected_op = None
-        for op in operations:
-            if op.id == st.session_state.selected_operation_id:
-                selected_op = op
-                break
+        selected_op = cached_operation_labels(get_database().version).get(st.session_state.selected_operation_id)
         
         if selected_op:
-            st.sidebar.info(f"📋 {selected_op.nom}\n👤 {selected_op.aco_responsable}")
+            nom, aco_responsable = selected_op
+            st.sidebar.info(f"📋 {nom}\n👤 {aco_responsable}")
             if st.sidebar.button("🗑️ Désélectionner"):
                 st.session_state.selected_operation_id = None
                 st.rerun()